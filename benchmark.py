@@ -0,0 +1,473 @@
+"""
+Benchmarks for the simulation, collision, network inference, trace
+recording and a full generation, headless and with fixed seeds so
+numbers can be compared across commits.
+
+    python benchmark.py                         # print a table
+    python benchmark.py --json results.json     # also save the numbers
+
+Every benchmark is run for the current code path and for the original
+per-bird implementation ("baseline"): Bird objects moved one by one,
+FeedForwardNetwork.activate per bird, per-bird mask collision and the
+list.index/pop bookkeeping of the old eval_genomes.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import neat
+
+import train
+from simulation import *
+from inference import BatchNetwork
+from environment import FlappyBirdEnv
+import checkpoint
+from checkpoint import Checkpointer
+from recording import TraceRecorder
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(LOCAL_DIR, 'config-feedforward.txt')
+
+
+def load_config(pop_size):
+    """
+    :param pop_size: population size to use instead of the one in the file
+    :return: neat config
+    """
+    config = train.load_config(CONFIG_PATH)
+    config.pop_size = pop_size
+    return config
+
+
+def make_genomes(config, seed, mutations=5):
+    """
+    a reproducible first generation, mutated a little so networks have hidden nodes
+    :param config: neat config
+    :param seed: int
+    :param mutations: mutation rounds per genome
+    :return: list of (genome_id, genome)
+    """
+    random.seed(seed)
+    population = neat.Population(config)
+    genomes = list(population.population.items())
+    for genome_id, genome in genomes:
+        for _ in range(mutations):
+            genome.mutate(config.genome_config)
+    return genomes
+
+
+def best_time(fn, repeat):
+    """
+    :param fn: function to time
+    :param repeat: runs, the fastest counts
+    :return: (seconds, return value of the last run)
+    """
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def peak_memory(fn):
+    """
+    :param fn: function to measure
+    :return: peak traced allocation while it ran, in bytes
+    """
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def baseline_play(genomes, config, course):
+    """
+    the game loop as eval_genomes originally ran it, headless
+    :return: (frames simulated, bird steps, why the game ended)
+    """
+    nets = []
+    birds = []
+    ge = []
+    for genome_id, genome in genomes:
+        genome.fitness = 0
+        nets.append(neat.nn.FeedForwardNetwork.create(genome, config))
+        birds.append(Bird(230, 350))
+        ge.append(genome)
+
+    pipe_count = 0
+    pipes = [Pipe(700, course.height(pipe_count))]
+    base = Base(FLOOR)
+    score = 0
+    frames = 0
+    bird_steps = 0
+    while len(birds) > 0:
+        frames += 1
+        pipe_ind = 0
+        if len(pipes) > 1 and birds[0].x > pipes[0].x + Pipe.WIDTH:
+            pipe_ind = 1
+
+        for x, bird in enumerate(birds):
+            ge[x].fitness += 0.1
+            bird.move()
+            bird_steps += 1
+            output = nets[birds.index(bird)].activate((bird.y, abs(bird.y - pipes[pipe_ind].height), abs(bird.y - pipes[pipe_ind].bottom)))
+            if output[0] > 0.5:
+                bird.jump()
+
+        base.move()
+
+        rem = []
+        add_pipe = False
+        for pipe in pipes:
+            pipe.move()
+            for bird in birds:
+                if baseline_collide(pipe, bird):
+                    ge[birds.index(bird)].fitness -= 1
+                    nets.pop(birds.index(bird))
+                    ge.pop(birds.index(bird))
+                    birds.pop(birds.index(bird))
+            if pipe.x + Pipe.WIDTH < 0:
+                rem.append(pipe)
+            if not pipe.passed and pipe.x < 230:
+                pipe.passed = True
+                add_pipe = True
+
+        if add_pipe:
+            score += 1
+            for genome in ge:
+                genome.fitness += 5
+            pipe_count += 1
+            pipes.append(Pipe(WIN_WIDTH, course.height(pipe_count)))
+        for r in rem:
+            pipes.remove(r)
+
+        for bird in birds:
+            if bird.hit_bounds():
+                nets.pop(birds.index(bird))
+                ge.pop(birds.index(bird))
+                birds.pop(birds.index(bird))
+
+        if score > 80:
+            return frames, bird_steps, "score"
+    return frames, bird_steps, "extinct"
+
+
+def baseline_collide(pipe, bird):
+    """
+    per-bird mask overlap without any prefilter, as the original Pipe.collide
+    :return: Bool
+    """
+    masks = get_masks()
+    bird_mask = bird.get_mask()
+    top_offset = (pipe.x - bird.x, pipe.top - round(bird.y))
+    bottom_offset = (pipe.x - bird.x, pipe.bottom - round(bird.y))
+    return mask_overlap(bird_mask, masks["pipe_bottom"], bottom_offset) or \
+        mask_overlap(bird_mask, masks["pipe_top"], top_offset)
+
+
+def bench_move(size, steps, repeat):
+    """
+    Bird.move one by one against one BirdBatch.move
+    """
+    def scalar():
+        birds = [Bird(230, 350) for _ in range(size)]
+        for frame in range(steps):
+            for bird in birds:
+                bird.move()
+                if frame % 8 == 0:
+                    bird.jump()
+
+    def batched():
+        birds = BirdBatch(size, 230, 350)
+        jump = np.ones(size, bool)
+        for frame in range(steps):
+            birds.move()
+            if frame % 8 == 0:
+                birds.jump(jump)
+
+    baseline, _ = best_time(scalar, repeat)
+    current, _ = best_time(batched, repeat)
+    return {"baseline_bird_steps_per_sec": size * steps / baseline,
+            "bird_steps_per_sec": size * steps / current}
+
+
+def bench_collide(size, repeat, seed):
+    """
+    per-bird mask collision against BirdBatch.collide, birds spread over the screen
+    and pipes swept across them
+    """
+    rng = np.random.default_rng(seed)
+    birds = BirdBatch(size, 230, 350)
+    birds.y = rng.uniform(-50, FLOOR, size)
+    birds.img_index = rng.integers(0, 3, size)
+    pipes = [Pipe(x, int(h)) for x, h in zip(range(130, 340, 5), rng.integers(50, 450, 42))]
+    scalar_birds = birds.alive_birds()
+
+    def scalar():
+        return sum(baseline_collide(pipe, bird) for pipe in pipes for bird in scalar_birds)
+
+    def batched():
+        return sum(int(birds.collide(pipe).sum()) for pipe in pipes)
+
+    baseline, expected = best_time(scalar, repeat)
+    current, hits = best_time(batched, repeat)
+    assert hits == expected, "batched collision disagrees with masks"
+    tests = size * len(pipes)
+    return {"baseline_tests_per_sec": tests / baseline, "tests_per_sec": tests / current}
+
+
+def bench_inference(size, repeat, seed):
+    """
+    FeedForwardNetwork.activate per bird against one BatchNetwork call
+    """
+    config = load_config(size)
+    genomes = [genome for genome_id, genome in make_genomes(config, seed)]
+    nets = [neat.nn.FeedForwardNetwork.create(genome, config) for genome in genomes]
+    batch = BatchNetwork(nets)
+    inputs = np.random.default_rng(seed).uniform(0, 700, (size, 3))
+    rows = [tuple(row) for row in inputs.tolist()]
+    frames = 20
+
+    def scalar():
+        for _ in range(frames):
+            for net, row in zip(nets, rows):
+                net.activate(row)
+
+    def batched():
+        for _ in range(frames):
+            batch.activate(inputs)
+
+    baseline, _ = best_time(scalar, repeat)
+    current, _ = best_time(batched, repeat)
+    return {"baseline_activations_per_sec": size * frames / baseline,
+            "activations_per_sec": size * frames / current}
+
+
+def bench_pipes(frames, repeat, seed):
+    """
+    the pipes of a long game, no birds: a PipePool against a new Pipe for
+    every pipe and list.remove, counting Pipe objects made and how traced
+    memory grows between the first and last tenth of the run
+    """
+    course = Course.generate(seed)
+
+    def churn(pipes, spawn, remove, samples=None):
+        pipe_count = 0
+        spawn(pipes, 700, course.height(pipe_count))
+        for frame in range(frames):
+            rem = []
+            add_pipe = False
+            for pipe in pipes:
+                pipe.move()
+                if pipe.x + Pipe.WIDTH < 0:
+                    rem.append(pipe)
+                if not pipe.passed and pipe.x < 230:
+                    pipe.passed = True
+                    add_pipe = True
+            if add_pipe:
+                pipe_count += 1
+                spawn(pipes, WIN_WIDTH, course.height(pipe_count))
+            for r in rem:
+                remove(pipes, r)
+            if samples is not None and frame % (frames // 10) == 0:
+                samples.append(tracemalloc.get_traced_memory()[0])
+        return pipe_count + 1
+
+    def pooled(samples=None):
+        pipes = PipePool()
+        churn(pipes, PipePool.spawn, PipePool.recycle, samples)
+        return pipes.created                    # Pipe objects made
+
+    def listed(samples=None):
+        return churn([], lambda pipes, x, height: pipes.append(Pipe(x, height)), list.remove, samples)
+
+    result = {}
+    for prefix, play in (("", pooled), ("baseline_", listed)):
+        elapsed, created = best_time(play, repeat)
+        samples = []
+        tracemalloc.start()
+        play(samples)
+        tracemalloc.stop()
+        result[prefix + "frames_per_sec"] = frames / elapsed
+        result[prefix + "pipes_created"] = created
+        result[prefix + "memory_growth_kb"] = (samples[-1] - samples[1]) / 1024.0
+    return result
+
+
+def bench_env(size, steps, repeat, seed):
+    """
+    FlappyBirdEnv.step with random actions, games resetting as they end
+    """
+    env = FlappyBirdEnv(size, seed=seed)
+    actions = np.random.default_rng(seed).random((steps, size)) < 0.05
+
+    def batched():
+        env.reset(seed)
+        for frame in range(steps):
+            env.step(actions[frame])
+
+    current, _ = best_time(batched, repeat)
+    return {"env_steps_per_sec": size * steps / current}
+
+
+def bench_decision_interval(size, frames, repeat, seed, intervals=(1, 2, 4)):
+    """
+    a generation's networks playing FlappyBirdEnv for some frames, deciding
+    every frame against every few frames with frame_skip
+    """
+    config = load_config(size)
+    batch = BatchNetwork.create([genome for genome_id, genome in make_genomes(config, seed)], config)
+    course = Course.generate(seed)
+    result = {}
+    for k in intervals:
+        env = FlappyBirdEnv(size, course=course, frame_skip=k)
+
+        def run():
+            obs = env.reset()
+            for step in range(frames // k):
+                obs = env.step(batch.decide(obs))[0]
+
+        elapsed, _ = best_time(run, repeat)
+        result["every_{0}_frames_per_sec".format(k)] = size * (frames // k) * k / elapsed
+    return result
+
+
+def bench_checkpoint(size, repeat, seed, directory):
+    """
+    writing and restoring a checkpoint of a mutated population
+    """
+    config = load_config(size)
+    random.seed(seed)
+    population = neat.Population(config)
+    for genome in population.population.values():
+        for _ in range(5):
+            genome.mutate(config.genome_config)
+    stats = neat.StatisticsReporter()
+    checkpointer = Checkpointer(population.reproduction, 1, os.path.join(directory, "bench-checkpoint-"), stats, verbose=False)
+    checkpointer.best_genome = next(iter(population.population.values()))
+    checkpointer.best_genome.fitness = 0.0
+
+    def blocking():
+        return checkpointer.save(config, population.population, population.species, 1)
+
+    def written():
+        path = blocking()
+        checkpointer.wait()
+        return path
+
+    save_blocking, _ = best_time(blocking, repeat)
+    checkpointer.wait()
+    save_total, path = best_time(written, repeat)
+    load, _ = best_time(lambda: checkpoint.restore(path, config), repeat)
+    result = {"save_blocking_seconds": save_blocking, "save_seconds": save_total, "load_seconds": load,
+              "size_mb": os.path.getsize(path) / 2**20}
+    os.remove(path)
+    return result
+
+
+def bench_generation(size, repeat, seed, baseline):
+    """
+    one full headless generation on a seeded course
+    """
+    config = load_config(size)
+    course = Course.generate(seed)
+    result = {}
+    paths = [("", lambda genomes: train.play(genomes, config, False, course))]
+    if baseline:
+        paths.append(("baseline_", lambda genomes: baseline_play(genomes, config, course)))
+
+    genomes = make_genomes(config, seed)     # playing only rewrites fitness, so every run can share them
+    for prefix, play in paths:
+        elapsed, (frames, bird_steps, reason) = best_time(lambda: play(genomes), repeat)
+        result[prefix + "frames"] = frames
+        result[prefix + "frames_per_sec"] = frames / elapsed
+        result[prefix + "bird_steps_per_sec"] = bird_steps / elapsed
+        result[prefix + "generations_per_min"] = 60.0 / elapsed
+        result[prefix + "peak_memory_mb"] = peak_memory(lambda: play(genomes)) / 2**20
+    return result
+
+
+def bench_trace(size, repeat, seed, directory):
+    """
+    one headless generation recorded to a trace, against the same generation unrecorded
+    """
+    config = load_config(size)
+    course = Course.generate(seed)
+    genomes = make_genomes(config, seed)
+    path = os.path.join(directory, "bench.trace")
+
+    def recorded():
+        with TraceRecorder(path, len(genomes)) as recorder:
+            return train.play(genomes, config, False, course, None, recorder)
+
+    plain, (frames, bird_steps, reason) = best_time(lambda: train.play(genomes, config, False, course), repeat)
+    traced, _ = best_time(recorded, repeat)
+    trace_bytes = os.path.getsize(path)
+    os.remove(path)
+    return {"frames": frames, "overhead_pct": 100.0 * (traced / plain - 1.0),
+            "recorded_frames_per_sec": frames / traced, "kb_per_1000_frames": trace_bytes / frames * 1000 / 1024.0}
+
+
+def git_commit():
+    """
+    :return: current commit hash, or None outside a git checkout
+    """
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=LOCAL_DIR,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[50, 500, 5000], help="population sizes")
+    parser.add_argument("--baseline-max", type=int, default=500,
+                        help="largest population the (quadratic) baseline generation is run for")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement, the fastest counts")
+    parser.add_argument("--seed", type=int, default=0, help="seed for genomes and the pipe course")
+    parser.add_argument("--json", help="write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = {"commit": git_commit(), "python": platform.python_version(), "numpy": np.__version__,
+               "seed": args.seed, "time": time.strftime("%Y-%m-%dT%H:%M:%S"), "benchmarks": {}}
+
+    result = bench_pipes(100000, args.repeat, args.seed)
+    results["benchmarks"]["pipes/100000"] = result
+    print("pipes, 100000 frames\n  " + "  ".join("{0}={1:.4g}".format(k, v) for k, v in sorted(result.items())))
+
+    for size in args.sizes:
+        print("population {0}".format(size))
+        benches = [("move", lambda: bench_move(size, 100, args.repeat)),
+                   ("collide", lambda: bench_collide(size, args.repeat, args.seed)),
+                   ("inference", lambda: bench_inference(size, args.repeat, args.seed)),
+                   ("env", lambda: bench_env(size, 200, args.repeat, args.seed)),
+                   ("interval", lambda: bench_decision_interval(size, 240, args.repeat, args.seed)),
+                   ("generation", lambda: bench_generation(size, args.repeat, args.seed, size <= args.baseline_max)),
+                   ("checkpoint", lambda: bench_checkpoint(size, args.repeat, args.seed, tempfile.gettempdir())),
+                   ("trace", lambda: bench_trace(size, args.repeat, args.seed, tempfile.gettempdir()))]
+        for name, bench in benches:
+            result = bench()
+            results["benchmarks"]["{0}/{1}".format(name, size)] = result
+            print("  {0:<11}".format(name) + "  ".join("{0}={1:.4g}".format(k, v) for k, v in sorted(result.items())))
+            sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+    return results
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Checkpoints of a training run, so it can be resumed after a crash.
+
+A checkpoint holds the population, the species, the best genome so far,
+the statistics reporter, the random number generator states and whatever
+extra state the trainer hands in (train.py saves its generation counter and
+course settings). The file is a short header (magic and format version)
+followed by a zlib compressed pickle. It is serialized at the end of a
+generation, then compressed and written in a background thread, and a
+new file only replaces an old one once it is complete.
+
+    python train.py --resume checkpoint-10
+"""
+import os
+import pickle
+import random
+import struct
+import threading
+import time
+import zlib
+from itertools import count
+
+import numpy as np
+import neat
+
+MAGIC = b"FBCK"
+VERSION = 1
+HEADER = struct.Struct(">4sH")
+
+
+def save_checkpoint(path, data, level=1):
+    """
+    write a checkpoint atomically: to a temporary file first, then renamed over path
+    :param path: file to write
+    :param data: dict from Checkpointer.snapshot, or its pickled bytes
+    :param level: zlib compression level
+    :return: None
+    """
+    if not isinstance(data, bytes):
+        data = pickle.dumps(data, pickle.HIGHEST_PROTOCOL)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION))
+        f.write(zlib.compress(data, level))
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    """
+    read a checkpoint written by save_checkpoint
+    :param path: checkpoint file
+    :return: dict
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    magic, version = HEADER.unpack_from(raw)
+    if magic != MAGIC:
+        raise ValueError("{0} is not a checkpoint".format(path))
+    if version != VERSION:
+        raise ValueError("{0} is checkpoint format {1}, this version reads {2}".format(path, version, VERSION))
+    return pickle.loads(zlib.decompress(raw[HEADER.size:]))
+
+
+def take_next(indexer):
+    """
+    the value an id counter hands out next, without using it up
+    :param indexer: itertools.count, or None for a counter not started yet
+    :return: (next value or None, counter to put back in its place)
+    """
+    if indexer is None:
+        return None, None
+    n = next(indexer)
+    return n, count(n)
+
+
+def restore(path, config):
+    """
+    rebuild the population saved in a checkpoint and the random states
+    :param path: checkpoint file
+    :param config: neat config of the run
+    :return: (neat.Population ready to continue, dict with "stats" and "extra" from the checkpoint)
+    """
+    data = load_checkpoint(path)
+    species = config.species_set_type(config.species_set_config, None)
+    species.species = data["species"]
+    species.genome_to_species = data["genome_to_species"]
+    species.indexer = count(data["next_species_id"])
+
+    p = neat.Population(config, (data["population"], species, data["generation"]))
+    species.reporters = p.reporters
+    p.best_genome = data["best_genome"]
+    p.reproduction.genome_indexer = count(data["next_genome_id"])
+    next_node_id = data["next_node_id"]
+    config.genome_config.node_indexer = count(next_node_id) if next_node_id is not None else None
+    random.setstate(data["random_state"])
+    np.random.set_state(data["numpy_state"])
+    return p, data
+
+
+class Checkpointer(neat.reporting.BaseReporter):
+    """
+    Saves a checkpoint every few generations, like neat.Checkpointer but
+    compact, versioned, atomic and without stalling the training loop.
+    """
+
+    def __init__(self, reproduction, generation_interval=5, filename_prefix="checkpoint-", stats=None, extra=None,
+                 background=True, verbose=True):
+        """
+        :param reproduction: the population's reproduction, whose genome id counter is saved
+        :param generation_interval: generations between checkpoints
+        :param filename_prefix: checkpoint files are this prefix plus the generation they resume at
+        :param stats: StatisticsReporter to save along, if any
+        :param extra: function returning a dict of more state to save, if any
+        :param background: compress and write in a thread instead of the training loop
+        :param verbose: print where each checkpoint goes
+        :return: None
+        """
+        self.reproduction = reproduction
+        self.generation_interval = generation_interval
+        self.filename_prefix = filename_prefix
+        self.stats = stats
+        self.extra = extra
+        self.background = background
+        self.verbose = verbose
+        self.generation = None
+        self.best_genome = None
+        self.last_checkpoint = None    # generation of the last checkpoint
+        self.thread = None
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        if self.best_genome is None or best_genome.fitness > self.best_genome.fitness:
+            self.best_genome = best_genome
+
+    def end_generation(self, config, population, species_set):
+        if self.last_checkpoint is None:
+            self.last_checkpoint = self.generation - 1     # the first one comes generation_interval generations in
+        if self.generation - self.last_checkpoint >= self.generation_interval:
+            self.save(config, population, species_set, self.generation + 1)
+            self.last_checkpoint = self.generation
+
+    def snapshot(self, config, population, species_set, generation):
+        """
+        everything needed to resume, gathered while the population can't change
+        :param config: neat config of the run, holds the node id counter
+        :param population: dict of genome id -> genome to evaluate next
+        :param species_set: the species of that population
+        :param generation: generation the population will be evaluated as
+        :return: dict
+        """
+        # the id counters as they are, not guessed from the genomes alive: the highest ids may have died out
+        next_node_id, config.genome_config.node_indexer = take_next(config.genome_config.node_indexer)
+        next_genome_id, self.reproduction.genome_indexer = take_next(self.reproduction.genome_indexer)
+        next_species_id, species_set.indexer = take_next(species_set.indexer)
+        return {"generation": generation,
+                "population": population,
+                "species": species_set.species,
+                "genome_to_species": species_set.genome_to_species,
+                "next_species_id": next_species_id,
+                "best_genome": self.best_genome,
+                "next_genome_id": next_genome_id,
+                "next_node_id": next_node_id,
+                "stats": self.stats,
+                "random_state": random.getstate(),
+                "numpy_state": np.random.get_state(),
+                "extra": self.extra() if self.extra else None,
+                "time": time.time()}
+
+    def save(self, config, population, species_set, generation):
+        """
+        checkpoint the population; the pickling happens here, the compressing
+        and writing in the background
+        :param config: neat config of the run
+        :param population: dict of genome id -> genome to evaluate next
+        :param species_set: the species of that population
+        :param generation: generation the population will be evaluated as
+        :return: path of the checkpoint
+        """
+        path = "{0}{1}".format(self.filename_prefix, generation)
+        data = pickle.dumps(self.snapshot(config, population, species_set, generation), pickle.HIGHEST_PROTOCOL)
+        self.wait()                    # one write at a time
+        if self.verbose:
+            print("Saving checkpoint to {0}".format(path))
+        if self.background:
+            self.thread = threading.Thread(target=save_checkpoint, args=(path, data))
+            self.thread.start()
+        else:
+            save_checkpoint(path, data)
+        return path
+
+    def wait(self):
+        """
+        block until the checkpoint being written is on disk
+        :return: None
+        """
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,182 @@
+"""
+One command line for training, watching, evaluating, exporting, videos, benchmarking and sweeps,
+so runs can be scripted without editing the settings in train.py:
+
+    python cli.py train --pop-size 500 --generations 100 --workers 8 --seed 3 --headless
+    python cli.py train --set DefaultGenome.weight_mutate_rate=0.9 --output best.pkl
+    python cli.py replay ai.pkl
+    python cli.py export ai.pkl --output ai_net.py
+    python cli.py evaluate ai.pkl bestbird.pickle --first-seed 0 --courses 500
+    python cli.py video ai.pkl --seed 0 --frames 5000 --output run.gif
+    python cli.py benchmark --sizes 50 500
+    python cli.py sweep --param NEAT.pop_size=20,50,100 --seeds 0 1 2
+"""
+import argparse
+import os
+import random
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(LOCAL_DIR, 'config-feedforward.txt')
+# train options that replace a setting of train.py; left out, they keep what train.py says
+TRAIN_SETTINGS = (("workers", "WORKERS"), ("seed", "SEED"), ("course_file", "COURSE_FILE"),
+                  ("generations", "GENERATIONS"), ("max_score", "MAX_SCORE"), ("max_frames", "MAX_FRAMES"),
+                  ("max_seconds", "MAX_SECONDS"), ("checkpoint_prefix", "CHECKPOINT_PREFIX"),
+                  ("trace", "TRACE_DIR"), ("decision_interval", "DECISION_INTERVAL"),
+                  ("decision_cache", "DECISION_CACHE"), ("decision_cache_size", "DECISION_CACHE_SIZE"),
+                  ("render", "RENDER"), ("stop_at_threshold", "STOP_AT_THRESHOLD"), ("fitness_cache", "FITNESS_CACHE"),
+                  ("verify_decision_cache", "DECISION_CACHE_VERIFY"))
+
+
+def parse_overrides(items):
+    """
+    :param items: list of "Section.key=value" strings
+    :return: dict of "Section.key" -> value
+    """
+    overrides = {}
+    for item in items:
+        name, sep, value = item.partition("=")
+        if not sep:
+            raise ValueError("--set expects Section.key=value, got {0!r}".format(item))
+        overrides[name.strip()] = value.strip()
+    return overrides
+
+
+def cmd_train(args):
+    import train
+    for option, setting in TRAIN_SETTINGS:
+        if getattr(args, option) is not None:
+            setattr(train, setting, getattr(args, option))
+    if args.fps is not None:
+        train.FPS = args.fps or None
+    if args.checkpoint_every is not None:
+        train.CHECKPOINT_EVERY = args.checkpoint_every or None
+    if args.profile:
+        from profiler import FrameProfiler
+        train.PROFILER = FrameProfiler(csv_path=args.profile)
+
+    overrides = parse_overrides(args.set)
+    if args.pop_size:
+        overrides["NEAT.pop_size"] = args.pop_size
+    train.run(args.config, args.resume, overrides, args.output)
+
+
+def cmd_replay(args):
+    config = None
+    if args.path.endswith(".py"):      # exported by standalone.py, plays without neat-python or a config
+        import standalone
+        net = standalone.load(args.path)
+    else:
+        import evaluate
+        import train
+        config = train.load_config(args.config, parse_overrides(args.set))
+        net = evaluate.load_player(args.path, config)
+    if args.decision_cache is not None:
+        from decision_cache import CachedNetwork
+        net = CachedNetwork(net, args.decision_cache, verify=bool(args.verify_decision_cache))
+        if args.decision_cache_size is not None:
+            net.size = args.decision_cache_size
+    if args.seed is not None:
+        random.seed(args.seed)        # the pipes of the replay come from random
+    import run                        # opens the window
+    run.main(net, config, args.fps, args.decision_interval or 1)
+
+
+def cmd_export(args):
+    import evaluate
+    import standalone
+    import train
+    config = train.load_config(args.config, parse_overrides(args.set))
+    standalone.export(evaluate.load_player(args.path, config), args.output)
+    print("Wrote {0}".format(args.output))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    config_args = argparse.ArgumentParser(add_help=False)
+    config_args.add_argument("--config", default=CONFIG_PATH, help="NEAT config file")
+    config_args.add_argument("--set", action="append", default=[], metavar="SECTION.KEY=VALUE",
+                             help="override a config value, e.g. NEAT.pop_size=500 (repeatable)")
+
+    interval_args = argparse.ArgumentParser(add_help=False)
+    interval_args.add_argument("--decision-interval", type=int,
+                               help="birds decide every this many frames, a jump plays out in between")
+
+    cache_args = argparse.ArgumentParser(add_help=False)
+    cache_args.add_argument("--decision-cache", type=float, metavar="QUANTUM",
+                            help="cache the bird's decisions by observations rounded to this step, 0 for exact ones "
+                                 "(see decision_cache.py)")
+    cache_args.add_argument("--decision-cache-size", type=int,
+                            help="cached decisions kept")
+    cache_args.add_argument("--verify-decision-cache", action=argparse.BooleanOptionalAction,
+                            help="activate on cache hits anyway and count the wrong decisions")
+
+    p = commands.add_parser("train", parents=[config_args, interval_args, cache_args], help="train a population")
+    p.add_argument("--pop-size", type=int, help="population size (NEAT.pop_size)")
+    p.add_argument("--generations", type=int, help="generations to train for")
+    p.add_argument("--workers", type=int, help="processes evaluating each generation")
+    p.add_argument("--headless", dest="render", action="store_const", const=False, help="train without a window")
+    p.add_argument("--render", dest="render", action="store_const", const=True, help="watch training in a window")
+    p.add_argument("--fps", type=int, help="frame cap while rendering, 0 for none")
+    p.add_argument("--seed", type=int, help="pipe course seed, every generation plays the same course")
+    p.add_argument("--course-file", help=".npy file the seeded course is memory mapped from, with the seed added to its name")
+    p.add_argument("--max-score", type=int, help="a game ends once its score goes past this")
+    p.add_argument("--max-frames", type=int, help="frame budget of a generation")
+    p.add_argument("--max-seconds", type=float, help="wall time budget of a generation")
+    p.add_argument("--stop-at-threshold", action=argparse.BooleanOptionalAction,
+                   help="end a game once fitness_threshold is sure to be reached")
+    p.add_argument("--checkpoint-every", type=int, help="generations between checkpoints, 0 for none")
+    p.add_argument("--checkpoint-prefix", help="checkpoint file name prefix")
+    p.add_argument("--resume", help="checkpoint file to continue from")
+    p.add_argument("--fitness-cache", action=argparse.BooleanOptionalAction,
+                   help="reuse the fitness of genomes carried over unchanged (elites) instead of playing them again")
+    p.add_argument("--trace", metavar="DIR",
+                   help="record every generation's game to a binary trace in this directory (see recording.py)")
+    p.add_argument("--profile", metavar="CSV", help="time the phases of each frame and append them to this file")
+    p.add_argument("--output", default=os.path.join(LOCAL_DIR, "ai.pkl"), help="where the best genome is saved")
+    p.set_defaults(func=cmd_train)
+
+    p = commands.add_parser("replay", parents=[config_args, interval_args, cache_args], help="watch a saved bird play")
+    p.add_argument("path", nargs="?", default=os.path.join(LOCAL_DIR, "ai.pkl"), help="pickled genome or network, or a standalone.py export")
+    p.add_argument("--fps", type=int, default=30, help="frame cap")
+    p.add_argument("--seed", type=int, help="seed for the pipes")
+    p.set_defaults(func=cmd_replay)
+
+    p = commands.add_parser("export", parents=[config_args], help="compile a saved bird into a standalone network file")
+    p.add_argument("path", nargs="?", default=os.path.join(LOCAL_DIR, "ai.pkl"), help="pickled genome or network")
+    p.add_argument("--output", default=os.path.join(LOCAL_DIR, "ai_net.py"), help="standalone network file to write")
+    p.set_defaults(func=cmd_export)
+
+    p = commands.add_parser("evaluate", add_help=False, help="run evaluate.py, the rest of the arguments go to it")
+    p.set_defaults(func=None)
+
+    p = commands.add_parser("video", add_help=False, help="run video.py, the rest of the arguments go to it")
+    p.set_defaults(func=None)
+
+    p = commands.add_parser("benchmark", add_help=False, help="run benchmark.py, the rest of the arguments go to it")
+    p.set_defaults(func=None)
+
+    p = commands.add_parser("sweep", add_help=False, help="run sweep.py, the rest of the arguments go to it")
+    p.set_defaults(func=None)
+
+    args, rest = parser.parse_known_args(argv)
+    if args.command == "evaluate":
+        import evaluate
+        return evaluate.main(rest)
+    if args.command == "video":
+        import video
+        return video.main(rest)
+    if args.command == "benchmark":
+        import benchmark
+        return benchmark.main(rest)
+    if args.command == "sweep":
+        import sweep
+        return sweep.main(rest)
+    if rest:
+        parser.error("unrecognized arguments: {0}".format(" ".join(rest)))
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    main()
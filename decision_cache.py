@@ -0,0 +1,161 @@
+"""
+A decision cache: skip a network's activation when it has already decided
+for (nearly) the same observation.
+
+The inputs a bird sees, its y and the distances to the gap, repeat a lot
+from frame to frame as every flap cycle passes the same heights again.
+Rounding each input to a multiple of `quantum` turns nearby observations
+into the same key, and CachedNetwork keeps a bounded LRU of keys to what
+the network answered the first time. It wraps one network with the
+activate() of FeedForwardNetwork, so it serves the scalar loops: the last
+bird of a training game (train.play_solo) and run.py's replay. The
+batched frames of train.play are not cached; one matrix product over
+every bird costs less than looking each of them up.
+
+With quantum 0 only exactly repeated observations hit, so the game plays
+out exactly as without a cache; a larger quantum hits more often but can
+answer for an observation the network would have decided differently.
+verify=True still activates on every hit and counts how often the cached
+decision was wrong, so accuracy can be weighed against the time saved:
+
+    python decision_cache.py bestbird.pickle --quantum 0 1 2 4 8
+"""
+import time
+from collections import OrderedDict
+from math import floor
+
+
+class CacheStats:
+    """
+    Counters shared by the caches of one game.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.checked = 0        # hits activated anyway, with verify
+        self.wrong = 0          # checked hits whose cached decision differed
+
+    def hit_rate(self):
+        """
+        :return: fraction of lookups answered from the cache
+        """
+        return self.hits / max(self.hits + self.misses, 1)
+
+    def __str__(self):
+        text = "{0:.1%} hits ({1} of {2}), {3} evictions".format(
+            self.hit_rate(), self.hits, self.hits + self.misses, self.evictions)
+        if self.checked:
+            text += ", {0} wrong of {1} checked ({2:.2%})".format(self.wrong, self.checked, self.wrong / self.checked)
+        return text
+
+
+def quantize(inputs, quantum):
+    """
+    the cache key of some inputs: each rounded to the nearest multiple of
+    quantum, counted in quanta
+    :param inputs: sequence of floats
+    :param quantum: step the inputs are rounded to, 0 keeps them as they are
+    :return: tuple
+    """
+    if not quantum:
+        return tuple(inputs)
+    scale = 1.0 / quantum
+    return tuple([floor(x * scale + 0.5) for x in inputs])
+
+
+class CachedNetwork:
+    """
+    A network whose activate() is looked up by quantized inputs first, with
+    the FeedForwardNetwork.activate interface.
+    """
+
+    def __init__(self, net, quantum=1.0, size=4096, verify=False, stats=None):
+        """
+        :param net: anything with activate(inputs), e.g. FeedForwardNetwork or StandaloneNetwork
+        :param quantum: step the inputs are rounded to for the key, 0 for exact inputs
+        :param size: entries kept, the least recently used is dropped beyond that
+        :param verify: activate on hits too and count wrong decisions in stats
+        :param stats: CacheStats to count into, a new one by default
+        :return: None
+        """
+        self.net = net
+        self.quantum = quantum
+        self.size = size
+        self.verify = verify
+        self.stats = stats if stats is not None else CacheStats()
+        self.entries = OrderedDict()        # key -> outputs, least recently used first
+
+    def activate(self, inputs):
+        """
+        :param inputs: network inputs
+        :return: list of outputs, maybe those of an earlier observation with the same key
+        """
+        key = quantize(inputs, self.quantum)
+        stats = self.stats
+        outputs = self.entries.get(key)
+        if outputs is None:
+            stats.misses += 1
+            outputs = self.entries[key] = self.net.activate(inputs)
+            if len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                stats.evictions += 1
+            return outputs
+        stats.hits += 1
+        self.entries.move_to_end(key)
+        if self.verify:
+            stats.checked += 1
+            stats.wrong += (self.net.activate(inputs)[0] > 0.5) != (outputs[0] > 0.5)
+        return outputs
+
+
+if __name__ == '__main__':
+    # hit rate, wrong decisions and time of a saved bird with and without a cache, on a seeded course
+    import argparse
+    import os
+    import evaluate
+    import train
+    from simulation import get_course
+
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Measure the decision cache on a saved bird")
+    parser.add_argument("path", nargs="?", default=os.path.join(local_dir, "bestbird.pickle"),
+                        help="pickled genome or network")
+    parser.add_argument("--quantum", type=float, nargs="+", default=[0, 1, 2, 4], help="quanta to try")
+    parser.add_argument("--size", type=int, default=4096, help="cache entries")
+    parser.add_argument("--frames", type=int, default=5000, help="frames to play")
+    parser.add_argument("--seed", type=int, default=0, help="course seed")
+    args = parser.parse_args()
+
+    config = train.load_config(os.path.join(local_dir, 'config-feedforward.txt'))
+    net = evaluate.load_player(args.path, config)
+
+    class TimedNetwork:
+        """
+        a network whose activate() adds up the time it takes
+        """
+
+        def __init__(self, net):
+            self.net = net
+            self.seconds = 0.0
+
+        def activate(self, inputs):
+            start = time.perf_counter()
+            outputs = self.net.activate(inputs)
+            self.seconds += time.perf_counter() - start
+            return outputs
+
+    def play(net):
+        timed = TimedNetwork(net)
+        frames, score, fitness, reason = train.play_one(timed, get_course(args.seed), args.frames)
+        return frames, score, timed.seconds
+
+    frames, score, seconds = play(net)
+    print("no cache:      {0} frames, score {1}, activate {2:.2f} us a frame".format(frames, score, 1e6 * seconds / frames))
+    for quantum in args.quantum:
+        frames, score, seconds = play(CachedNetwork(net, quantum, args.size))
+        checked = CachedNetwork(net, quantum, args.size, verify=True)
+        play(checked)
+        print("quantum {0:<5g} {1} frames, score {2}, activate {3:.2f} us a frame, {4}".format(
+            quantum, frames, score, 1e6 * seconds / frames, checked.stats))
@@ -0,0 +1,276 @@
+"""
+The game as a vectorized environment, for learners other than NEAT.
+
+FlappyBirdEnv runs N independent games side by side and steps them all in
+one call, with the same rules, observations and rewards as train.play:
+
+    env = FlappyBirdEnv(1000, seed=0)
+    obs = env.reset()                         # (N, 3) float array
+    while True:
+        obs, rewards, dones, info = env.step(policy(obs))
+
+A game that ends is reset on the spot, so `obs` always holds the first
+observation of the new game for those entries; the last observation of the
+finished game is in info["final_observation"] and how it ended in
+info["cause"], an index into FlappyBirdEnv.CAUSES.
+
+With frame_skip=k every step() plays k frames: the actions are taken on the
+first one and a jump then plays out over the rest, so a policy decides
+every k frames and is queried k times less. The rewards of those frames
+are summed; a game that ends part way stands still for the rest of them.
+"""
+import numpy as np
+
+from simulation import *
+
+
+class FlappyBirdEnv:
+    """
+    N games stepped together. Each game has one bird and its own pipes,
+    kept as NumPy arrays: the pipes of a game live in a ring of MAX_PIPES
+    slots, pipe number k in slot k % MAX_PIPES.
+    """
+    NUM_OBSERVATIONS = 3      # bird y, distance to the top pipe, distance to the bottom pipe
+    MAX_PIPES = 3             # pipes on screen at once never exceed this
+    BIRD_X = 230
+    BIRD_Y = 350
+    FIRST_PIPE_X = 700
+    CAUSES = ("playing", "top pipe", "bottom pipe", "floor", "ceiling", "max score")
+
+    def __init__(self, num_envs, seed=None, course=None, max_score=80, frame_skip=1):
+        """
+        :param num_envs: number of games (int)
+        :param seed: seed for the random pipe heights
+        :param course: Course every game takes its pipe heights from, a list of
+                       num_envs Courses (one per game) or None for random pipes
+        :param max_score: a game ends (truncated) once its score goes past this, None never
+        :param frame_skip: frames every step plays, the actions are taken on the first
+        :return: None
+        """
+        self.num_envs = num_envs
+        self.course = course
+        self.max_score = max_score
+        self.frame_skip = frame_skip
+        self.rng = np.random.default_rng(seed)
+        if isinstance(course, (list, tuple)):
+            if len(course) != num_envs:
+                raise ValueError("{0} courses for {1} games".format(len(course), num_envs))
+            self.heights = np.stack([np.asarray(c.heights) for c in course])      # (num_envs, length)
+        else:
+            self.heights = np.asarray(course.heights) if course is not None else None
+
+        self.birds = BirdBatch(num_envs, self.BIRD_X, self.BIRD_Y)
+        self.pipe_x = np.zeros((num_envs, self.MAX_PIPES), np.int64)
+        self.pipe_height = np.zeros((num_envs, self.MAX_PIPES), np.int64)
+        self.pipe_passed = np.zeros((num_envs, self.MAX_PIPES), bool)
+        self.first_pipe = np.zeros(num_envs, np.int64)     # number of the oldest pipe still on screen
+        self.pipe_count = np.zeros(num_envs, np.int64)     # pipes created this game
+        self.score = np.zeros(num_envs, np.int64)
+        self.steps = np.zeros(num_envs, np.int64)          # frames played this game
+
+    def reset(self, seed=None):
+        """
+        start every game over
+        :param seed: reseed the random pipe heights
+        :return: observations, float array (num_envs, NUM_OBSERVATIONS)
+        """
+        if seed is not None:
+            self.rng = np.random.default_rng(seed)
+        everything = np.ones(self.num_envs, bool)
+        self._reset(everything)
+        self.birds.move()
+        return self._observe(everything)
+
+    def step(self, actions):
+        """
+        play frame_skip frames of every game
+        :param actions: array (num_envs,), True (or non zero) makes the bird jump
+        :return: (observations, rewards, dones, info) where info holds
+                 "score", "truncated", "cause", "steps" (frames played) and
+                 "final_observation" of the games that just finished, before
+                 they were reset
+        """
+        birds = self.birds
+        birds.jump(np.asarray(actions).astype(bool))
+        rewards = np.zeros(self.num_envs)
+        dones = np.zeros(self.num_envs, bool)
+        info = {"score": np.zeros(self.num_envs, np.int64), "truncated": np.zeros(self.num_envs, bool),
+                "cause": np.zeros(self.num_envs, np.int64), "steps": np.zeros(self.num_envs, np.int64),
+                "final_observation": np.zeros((self.num_envs, self.NUM_OBSERVATIONS))}
+        for frame in range(self.frame_skip):
+            if frame:
+                birds.move()
+            ended = self._frame(~dones, rewards, info)
+            dones |= ended
+            birds.alive[ended] = False      # stands still until the reset
+        info["score"][~dones] = self.score[~dones]
+        if dones.any():
+            # the finished birds move once more, so their final observation comes after a move like the others
+            birds.alive[:] = dones
+            birds.move()
+            info["final_observation"][dones] = self._observe(dones)[dones]
+            self._reset(dones)
+            birds.alive[:] = True
+        birds.move()
+        return self._observe(np.ones(self.num_envs, bool)), rewards, dones, info
+
+    def _frame(self, playing, rewards, info):
+        """
+        play one frame of the selected games, after the birds moved
+        :param playing: bool array (num_envs,), games to play
+        :param rewards: float array (num_envs,) the frame's rewards are added to
+        :param info: dict of arrays of step(), filled in for the games that end
+        :return: bool array (num_envs,), the games that ended
+        """
+        birds = self.birds
+        active = self._active() & playing[:, None]
+        self.pipe_x[active] -= Pipe.VEL
+
+        hits = np.zeros(self.num_envs, bool)
+        top_hits = np.zeros(self.num_envs, bool)
+        bird_y = np.round(birds.y)
+        for slot in range(self.MAX_PIPES):
+            hit = active[:, slot] & birds.collide_each(self.pipe_x[:, slot], self.pipe_height[:, slot])
+            hits |= hit
+            top_hits |= hit & (bird_y < self.pipe_height[:, slot])    # above the gap, can't reach the bottom pipe
+
+        passed = active & ~self.pipe_passed & (self.pipe_x < birds.x)
+        self.pipe_passed |= passed
+        add_pipe = passed.any(axis=1)
+        off_screen = (active & (self.pipe_x + Pipe.WIDTH < 0)).any(axis=1)
+
+        # same fitness as train.play: 0.1 a frame, -1 for hitting a pipe, 5 for every pipe passed alive
+        rewards += np.where(playing, 0.1 - hits + 5.0 * (add_pipe & ~hits), 0.0)
+        self.score += add_pipe
+        self.steps += playing
+        self._add_pipes(add_pipe)
+        self.first_pipe += off_screen
+
+        bounds = birds.hit_bounds()
+        dead = hits | bounds
+        truncated = playing & ~dead & (self.score > self.max_score) if self.max_score is not None else np.zeros_like(dead)
+        dones = dead | truncated
+
+        cause = np.zeros(self.num_envs, np.int64)        # index into CAUSES
+        cause[truncated] = 5
+        cause[bounds & (birds.y < 0)] = 4
+        cause[bounds & (birds.y >= 0)] = 3
+        cause[hits] = np.where(top_hits[hits], 1, 2)
+        info["score"][dones] = self.score[dones]
+        info["truncated"] |= truncated
+        info["cause"][dones] = cause[dones]
+        info["steps"][dones] = self.steps[dones]
+        return dones
+
+    def _active(self):
+        """
+        which pipe slots of every game hold a pipe still on screen
+        :return: bool array (num_envs, MAX_PIPES)
+        """
+        age = (np.arange(self.MAX_PIPES) - self.first_pipe[:, None]) % self.MAX_PIPES
+        return age < (self.pipe_count - self.first_pipe)[:, None]
+
+    def _heights(self, rows, numbers):
+        """
+        gap heights of new pipes
+        :param rows: int array, game of each pipe
+        :param numbers: int array, pipe number within its game
+        :return: int array
+        """
+        if self.heights is None:
+            return self.rng.integers(50, 450, len(numbers))
+        if self.heights.ndim == 2:
+            return self.heights[rows, numbers % self.heights.shape[1]].astype(np.int64)
+        return self.heights[numbers % len(self.heights)].astype(np.int64)
+
+    def _add_pipes(self, mask):
+        """
+        put a new pipe at the right edge of the selected games
+        :param mask: bool array (num_envs,)
+        :return: None
+        """
+        rows = np.flatnonzero(mask)
+        numbers = self.pipe_count[rows]
+        slots = numbers % self.MAX_PIPES
+        self.pipe_x[rows, slots] = WIN_WIDTH
+        self.pipe_height[rows, slots] = self._heights(rows, numbers)
+        self.pipe_passed[rows, slots] = False
+        self.pipe_count[rows] += 1
+
+    def _reset(self, mask):
+        """
+        start the selected games over: a fresh bird and one pipe
+        :param mask: bool array (num_envs,)
+        :return: None
+        """
+        rows = np.flatnonzero(mask)
+        fresh = BirdBatch(len(rows), self.BIRD_X, self.BIRD_Y)
+        for name in ("y", "tilt", "tick_count", "vel", "height", "img_count", "img_index", "alive"):
+            getattr(self.birds, name)[rows] = getattr(fresh, name)
+        self.first_pipe[rows] = 0
+        self.pipe_count[rows] = 0
+        self.score[rows] = 0
+        self.steps[rows] = 0
+        self._add_pipes(mask)
+        self.pipe_x[rows, 0] = self.FIRST_PIPE_X
+
+    def _observe(self, mask):
+        """
+        the network inputs of train.play for the selected games, zeros elsewhere
+        :param mask: bool array (num_envs,)
+        :return: float array (num_envs, NUM_OBSERVATIONS)
+        """
+        obs = np.zeros((self.num_envs, self.NUM_OBSERVATIONS))
+        rows = np.flatnonzero(mask)
+        first = self.first_pipe[rows]
+        # look at the second pipe once the bird is past the first
+        past = (self.pipe_count[rows] - first > 1) & \
+            (self.birds.x > self.pipe_x[rows, first % self.MAX_PIPES] + Pipe.WIDTH)
+        slot = (first + past) % self.MAX_PIPES
+        height = self.pipe_height[rows, slot]
+        y = self.birds.y[rows]
+        obs[rows, 0] = y
+        obs[rows, 1] = np.abs(y - height)
+        obs[rows, 2] = np.abs(y - (height + Pipe.GAP))
+        return obs
+
+    def take(self, rows):
+        """
+        an environment holding only some of the games, as they are now; used
+        to stop stepping games that are over
+        :param rows: indices of the games to keep
+        :return: FlappyBirdEnv
+        """
+        env = FlappyBirdEnv.__new__(FlappyBirdEnv)
+        env.num_envs = len(rows)
+        env.course = [self.course[i] for i in rows] if isinstance(self.course, (list, tuple)) else self.course
+        env.max_score = self.max_score
+        env.frame_skip = self.frame_skip
+        env.rng = self.rng
+        env.heights = self.heights[rows] if self.heights is not None and self.heights.ndim == 2 else self.heights
+        env.birds = self.birds.take(rows)
+        for name in ("pipe_x", "pipe_height", "pipe_passed", "first_pipe", "pipe_count", "score", "steps"):
+            setattr(env, name, getattr(self, name)[rows])
+        return env
+
+    def bird(self, i):
+        """
+        the bird of one game as a Bird object, for drawing
+        :param i: game index
+        :return: Bird
+        """
+        return self.birds.bird(i)
+
+    def pipes(self, i):
+        """
+        the pipes of one game as Pipe objects, oldest first, for drawing
+        :param i: game index
+        :return: list of Pipe
+        """
+        pipes = []
+        for number in range(self.first_pipe[i], self.pipe_count[i]):
+            slot = number % self.MAX_PIPES
+            pipe = Pipe(int(self.pipe_x[i, slot]), int(self.pipe_height[i, slot]))
+            pipe.passed = bool(self.pipe_passed[i, slot])
+            pipes.append(pipe)
+        return pipes
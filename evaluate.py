@@ -0,0 +1,228 @@
+"""
+How good is a saved bird, really? Plays one or many saved birds on
+hundreds of seeded courses, headless and in parallel, and reports the
+score distribution, how long they survive and what kills them.
+
+    python evaluate.py ai.pkl bestbird.pickle --courses 500 --workers 8
+    python evaluate.py ai.pkl --decision-interval 1 2 4 8     # how far can decisions be spread out?
+
+A saved bird is a pickled genome (ai.pkl, written by train.py), a pickled
+FeedForwardNetwork (bestbird.pickle), or a pickled list of either.
+"""
+import argparse
+import json
+import os
+import pickle
+import time
+from multiprocessing import Pool
+
+import numpy as np
+import neat
+
+from environment import FlappyBirdEnv
+from inference import BatchNetwork
+from simulation import get_course
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(LOCAL_DIR, 'config-feedforward.txt')
+PERCENTILES = (10, 50, 90)
+
+
+def to_network(player, config):
+    """
+    :param player: genome or FeedForwardNetwork
+    :param config: neat config
+    :return: neat.nn.FeedForwardNetwork
+    """
+    if isinstance(player, neat.nn.FeedForwardNetwork):
+        return player
+    return neat.nn.FeedForwardNetwork.create(player, config)
+
+
+def load_player(path, config):
+    """
+    the network of a saved bird: a pickled genome (ai.pkl) or a pickled
+    FeedForwardNetwork (bestbird.pickle)
+    :param path: pickle file
+    :param config: neat config
+    :return: neat.nn.FeedForwardNetwork
+    """
+    with open(path, "rb") as f:
+        return to_network(pickle.load(f), config)
+
+
+def load_players(paths, config):
+    """
+    every saved bird in some files, a file may hold a list of them
+    :param paths: pickle files
+    :param config: neat config
+    :return: list of (name, FeedForwardNetwork)
+    """
+    players = []
+    for path in paths:
+        with open(path, "rb") as f:
+            saved = pickle.load(f)
+        if isinstance(saved, (list, tuple)):
+            players.extend(("{0}[{1}]".format(path, i), to_network(p, config)) for i, p in enumerate(saved))
+        else:
+            players.append((path, to_network(saved, config)))
+    return players
+
+
+def play_courses(nets, seeds, max_score=80, max_frames=None, decision_interval=1):
+    """
+    every bird plays every course, each pairing its own game, all stepped
+    together; once half the games stepped are over, only the rest are kept
+    :param nets: list of FeedForwardNetwork
+    :param seeds: course seeds
+    :param max_score: a game ends once its score goes past this
+    :param max_frames: a game ends after this many frames (rounded up to whole decisions), None plays on
+    :param decision_interval: the birds decide every this many frames, see FlappyBirdEnv's frame_skip
+    :return: dict of arrays (birds, courses): "fitness", "score", "frames" and
+             "cause" (index into FlappyBirdEnv.CAUSES, 0 if max_frames ended it)
+    """
+    courses = [get_course(seed) for seed in seeds]
+    shape = (len(nets), len(courses))
+    games = np.arange(shape[0] * shape[1])           # game g is bird g // courses on course g % courses
+    players = games // shape[1]
+    try:
+        batch = BatchNetwork(nets).take(players)
+    except ValueError:                   # not a tanh/sum network, evaluate one by one
+        batch = None
+
+    env = FlappyBirdEnv(len(games), course=[courses[i] for i in games % shape[1]], max_score=max_score,
+                        frame_skip=decision_interval)
+    obs = env.reset()
+    fitness = np.zeros(len(games))
+    score = np.zeros(len(games), np.int64)
+    frames = np.zeros(len(games), np.int64)
+    cause = np.zeros(len(games), np.int64)
+    playing = np.ones(len(games), bool)              # over the games env steps
+    frame = 0
+    while playing.any() and (max_frames is None or frame < max_frames):
+        frame += decision_interval
+        if batch is not None:
+            jumps = batch.decide(obs)
+        else:
+            jumps = np.array([nets[i].activate(tuple(row))[0] > 0.5 for i, row in zip(players, obs)])
+        obs, rewards, dones, info = env.step(jumps)
+        fitness[games[playing]] += rewards[playing]
+        ended = playing & dones
+        score[games[ended]] = info["score"][ended]
+        frames[games[ended]] = info["steps"][ended]
+        cause[games[ended]] = info["cause"][ended]
+        playing &= ~dones
+        if ended.any() and 2 * playing.sum() <= len(playing):
+            keep = np.flatnonzero(playing)
+            env, obs, games, players, playing = env.take(keep), obs[keep], games[keep], players[keep], playing[keep]
+            if batch is not None:
+                batch = batch.take(keep)
+    score[games[playing]] = env.score[playing]       # still going when max_frames ran out
+    frames[games[playing]] = frame
+    return dict((key, value.reshape(shape)) for key, value in
+                (("fitness", fitness), ("score", score), ("frames", frames), ("cause", cause)))
+
+
+def _play_courses(job):
+    nets, seeds, max_score, max_frames, decision_interval = job
+    return play_courses(nets, seeds, max_score, max_frames, decision_interval)
+
+
+def evaluate(nets, seeds, workers=1, max_score=80, max_frames=None, decision_interval=1):
+    """
+    play every bird on every course, the courses split between the workers
+    :param nets: list of FeedForwardNetwork
+    :param seeds: course seeds
+    :param workers: processes
+    :return: dict of arrays (birds, courses) like play_courses'
+    """
+    seeds = list(seeds)
+    workers = max(1, min(workers, len(seeds)))
+    jobs = [(nets, seeds[i::workers], max_score, max_frames, decision_interval) for i in range(workers)]
+    if workers > 1:
+        with Pool(workers) as pool:
+            parts = pool.map(_play_courses, jobs)
+    else:
+        parts = [_play_courses(job) for job in jobs]
+    order = np.argsort(np.concatenate([np.arange(len(seeds))[i::workers] for i in range(workers)]))
+    return dict((key, np.concatenate([part[key] for part in parts], axis=1)[:, order]) for key in parts[0])
+
+
+def summarize(results, i):
+    """
+    :param results: from evaluate()
+    :param i: bird index
+    :return: dict of statistics of one bird over every course
+    """
+    score = results["score"][i]
+    frames = results["frames"][i]
+    causes = np.bincount(results["cause"][i], minlength=len(FlappyBirdEnv.CAUSES))
+    summary = {"courses": len(score),
+               "mean_fitness": float(results["fitness"][i].mean()),
+               "mean_score": float(score.mean()), "min_score": int(score.min()), "max_score": int(score.max()),
+               "mean_frames": float(frames.mean())}
+    for q in PERCENTILES:
+        summary["p{0}_score".format(q)] = float(np.percentile(score, q))
+        summary["p{0}_frames".format(q)] = float(np.percentile(frames, q))
+    summary["causes"] = dict((name, int(count)) for name, count in zip(FlappyBirdEnv.CAUSES, causes) if count)
+    return summary
+
+
+def print_summary(name, summary):
+    """
+    :param name: bird name
+    :param summary: from summarize()
+    :return: None
+    """
+    print("{0}: {1} courses".format(name, summary["courses"]))
+    print("  score   mean {0:.1f}, min {1}, {2}, max {3}".format(
+        summary["mean_score"], summary["min_score"],
+        ", ".join("p{0} {1:.0f}".format(q, summary["p{0}_score".format(q)]) for q in PERCENTILES),
+        summary["max_score"]))
+    print("  frames  mean {0:.0f}, {1}".format(
+        summary["mean_frames"], ", ".join("p{0} {1:.0f}".format(q, summary["p{0}_frames".format(q)]) for q in PERCENTILES)))
+    total = float(summary["courses"])
+    print("  ended   " + ", ".join("{0} {1:.0%}".format(cause, count / total)
+                                   for cause, count in sorted(summary["causes"].items(), key=lambda c: -c[1])))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("paths", nargs="*", default=[os.path.join(LOCAL_DIR, "ai.pkl")],
+                        help="pickled genomes or networks")
+    parser.add_argument("--config", default=CONFIG_PATH, help="NEAT config file genomes were trained with")
+    parser.add_argument("--courses", type=int, default=100, help="seeded courses to play")
+    parser.add_argument("--first-seed", type=int, default=0, help="seed of the first course")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes")
+    parser.add_argument("--max-score", type=int, default=80, help="a game ends once its score goes past this")
+    parser.add_argument("--max-frames", type=int, help="a game ends after this many frames")
+    parser.add_argument("--decision-interval", type=int, nargs="+", default=[1],
+                        help="birds decide every this many frames, several values are compared")
+    parser.add_argument("--json", help="write the statistics to this file")
+    args = parser.parse_args(argv)
+
+    import train
+    config = train.load_config(args.config)
+    players = load_players(args.paths, config)
+    seeds = range(args.first_seed, args.first_seed + args.courses)
+
+    summaries = {}
+    for interval in args.decision_interval:
+        start = time.perf_counter()
+        results = evaluate([net for name, net in players], seeds, args.workers, args.max_score, args.max_frames,
+                           interval)
+        if len(args.decision_interval) > 1:
+            print("Deciding every {0} frames: {1:.1f}s".format(interval, time.perf_counter() - start))
+        for i, (name, net) in enumerate(players):
+            if len(args.decision_interval) > 1:
+                name = "{0} every {1} frames".format(name, interval)
+            summaries[name] = summarize(results, i)
+            print_summary(name, summaries[name])
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summaries, f, indent=2)
+    return summaries
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""
+Batched inference for a whole generation of NEAT networks.
+
+neat.nn.FeedForwardNetwork.activate walks Python dicts once per bird per
+frame. BatchNetwork compiles every network of a generation into padded,
+layer ordered weight tensors so all live birds are evaluated together with
+one matrix product per layer.
+"""
+import numpy as np
+import neat
+
+
+class BatchNetwork:
+    """
+    A generation of feed forward networks (tanh activation, sum aggregation)
+    compiled to NumPy arrays.
+
+    Every network gets the same value layout: its inputs first, then a slot
+    that always holds 0.0 (outputs that nothing connects to), then one block
+    of slots per layer, padded to the widest network. Padding slots have zero
+    weights and are never read.
+    """
+
+    def __init__(self, nets):
+        """
+        Compile the networks
+        :param nets: list of neat.nn.FeedForwardNetwork
+        :return: None
+        """
+        num_inputs = len(nets[0].input_nodes)
+        num_outputs = len(nets[0].output_nodes)
+        self.zero_slot = num_inputs
+
+        n = len(nets)
+
+        # group every network's node evals by depth so independent nodes are computed together
+        layered = []
+        for net in nets:
+            depth = dict((key, 0) for key in net.input_nodes)
+            layers = []
+            for node, act_func, agg_func, bias, response, links in net.node_evals:
+                if act_func is not neat.activations.tanh_activation or agg_func is not neat.aggregations.sum_aggregation:
+                    raise ValueError("only tanh/sum networks can be compiled, node {0} is not".format(node))
+                d = 1 + max([depth[i] for i, w in links] or [0])
+                depth[node] = d
+                while len(layers) < d:
+                    layers.append([])
+                layers[d - 1].append((node, bias, response, links))
+            layered.append(layers)
+
+        self.depths = np.array([len(layers) for layers in layered], np.int64)   # layers each network uses
+        num_layers = int(self.depths.max()) if n else 0
+        widths = [max([len(layers[l]) for layers in layered if l < len(layers)]) for l in range(num_layers)]
+        starts = np.cumsum([num_inputs + 1] + widths)          # first slot of each layer
+        self.num_slots = int(starts[-1])
+
+        self.weights = [np.zeros((n, w, self.num_slots)) for w in widths]
+        self.biases = [np.zeros((n, w)) for w in widths]
+        self.responses = [np.zeros((n, w)) for w in widths]
+        self.layer_slots = [slice(int(starts[l]), int(starts[l + 1])) for l in range(num_layers)]
+        self.output_slots = np.full((n, num_outputs), self.zero_slot, np.int64)
+
+        for k, (net, layers) in enumerate(zip(nets, layered)):
+            slot = dict((key, i) for i, key in enumerate(net.input_nodes))
+            for l, layer in enumerate(layers):
+                for j, (node, bias, response, links) in enumerate(layer):
+                    slot[node] = int(starts[l]) + j
+                    self.biases[l][k, j] = bias
+                    self.responses[l][k, j] = response
+                    for i, w in links:
+                        self.weights[l][k, j, slot[i]] += w
+            for o, key in enumerate(net.output_nodes):
+                if key in slot:
+                    self.output_slots[k, o] = slot[key]
+
+    @staticmethod
+    def create(genomes, config):
+        """
+        Build the phenotypes of a list of genomes and compile them
+        :param genomes: list of genomes
+        :param config: neat config
+        :return: BatchNetwork
+        """
+        return BatchNetwork([neat.nn.FeedForwardNetwork.create(genome, config) for genome in genomes])
+
+    def take(self, rows):
+        """
+        a smaller batch holding only some of the networks, without the
+        layers none of them use
+        :param rows: indices of the networks to keep
+        :return: BatchNetwork
+        """
+        batch = BatchNetwork.__new__(BatchNetwork)
+        batch.zero_slot = self.zero_slot
+        batch.num_slots = self.num_slots
+        batch.depths = self.depths[rows]
+        num_layers = int(batch.depths.max()) if len(rows) else 0
+        batch.weights = [w[rows] for w in self.weights[:num_layers]]
+        batch.biases = [b[rows] for b in self.biases[:num_layers]]
+        batch.responses = [r[rows] for r in self.responses[:num_layers]]
+        batch.layer_slots = self.layer_slots[:num_layers]
+        batch.output_slots = self.output_slots[rows]
+        return batch
+
+    def activate(self, inputs, rows=None):
+        """
+        Evaluate many networks at once
+        :param inputs: array (len(rows), num_inputs), one row of inputs per network
+        :param rows: indices of the networks to evaluate, default all of them
+        :return: array (len(rows), num_outputs)
+        """
+        if rows is not None and len(rows) == len(self.output_slots):
+            rows = None                        # every network, no need to gather rows
+        select = (lambda a: a) if rows is None else (lambda a: a[rows])
+        depth = int(select(self.depths).max()) if len(inputs) else 0
+
+        values = np.zeros((len(inputs), self.num_slots))
+        values[:, :inputs.shape[1]] = inputs
+
+        for l in range(depth):                 # deeper layers are unused by these networks
+            s = np.einsum("nws,ns->nw", select(self.weights[l]), values)
+            # same as neat.activations.tanh_activation; its clip to +-60 is left out since tanh is already exactly +-1 there
+            values[:, self.layer_slots[l]] = np.tanh(2.5 * (select(self.biases[l]) + select(self.responses[l]) * s))
+
+        flat = select(self.output_slots) + (np.arange(len(values)) * self.num_slots)[:, None]
+        return values.ravel()[flat]
+
+    def decide(self, inputs, rows=None):
+        """
+        Which birds jump: the first output over 0.5, as in eval_genomes
+        :param inputs: array (len(rows), num_inputs)
+        :param rows: indices of the networks to evaluate, default all of them
+        :return: bool array (len(rows),)
+        """
+        return self.activate(inputs, rows)[:, 0] > 0.5
+
+
+def max_difference(nets, inputs):
+    """
+    Largest difference between BatchNetwork and FeedForwardNetwork.activate
+    :param nets: list of neat.nn.FeedForwardNetwork
+    :param inputs: array (len(nets), num_inputs)
+    :return: float
+    """
+    batch = BatchNetwork(nets)
+    expected = np.array([net.activate(tuple(row)) for net, row in zip(nets, inputs)])
+    return float(np.abs(batch.activate(inputs) - expected).max())
+
+
+if __name__ == '__main__':
+    # compile an evolved-looking population and the shipped birds, and check them against stock activate
+    import os
+    import random
+    import evaluate
+    import train
+
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+    config = train.load_config(os.path.join(local_dir, 'config-feedforward.txt'))
+    random.seed(0)
+    population = neat.Population(config)
+    genomes = list(population.population.values())
+    for genome in genomes:                 # mutate a while so hidden nodes and odd topologies show up
+        for _ in range(30):
+            genome.mutate(config.genome_config)
+
+    nets = [neat.nn.FeedForwardNetwork.create(genome, config) for genome in genomes]
+    rng = np.random.default_rng(0)
+    checks = [("mutated population", nets, rng.uniform(-100, 800, (len(nets), config.genome_config.num_inputs)))]
+    for name in ("ai.pkl", "bestbird.pickle"):
+        player = evaluate.load_player(os.path.join(local_dir, name), config)
+        checks.append((name, [player] * 1000, rng.uniform(-100, 800, (1000, config.genome_config.num_inputs))))
+
+    failed = False
+    for name, nets, inputs in checks:
+        difference = max_difference(nets, inputs)
+        print("{0}: max difference vs FeedForwardNetwork.activate {1:.3g}".format(name, difference))
+        failed |= not difference < 1e-12
+    if failed:
+        raise SystemExit("BatchNetwork does not match FeedForwardNetwork.activate")
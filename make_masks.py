@@ -0,0 +1,32 @@
+"""
+Write imgs/masks.npz, the collision masks simulation.py loads, from the
+sprites in imgs/ with pygame: the masks of the sprites scaled up with
+scale2x, as the game draws them. Only needed again when a sprite changes.
+
+    python make_masks.py
+"""
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")      # no window is opened
+import numpy as np
+import pygame
+
+from simulation import IMG_DIR, MASK_FILE
+
+
+def sprite_mask(name):
+    """
+    :param name: file name inside imgs/
+    :return: 2d bool array indexed [y, x], as pygame.mask.from_surface of the scaled up sprite
+    """
+    mask = pygame.mask.from_surface(pygame.transform.scale2x(pygame.image.load(os.path.join(IMG_DIR, name))))
+    width, height = mask.get_size()
+    return np.array([[mask.get_at((x, y)) for x in range(width)] for y in range(height)], bool)
+
+
+if __name__ == '__main__':
+    masks = dict(("bird" + str(x), sprite_mask("bird" + str(x) + ".png")) for x in range(1, 4))
+    masks["pipe"] = sprite_mask("pipe.png")
+    np.savez_compressed(MASK_FILE, **masks)
+    print("Wrote {0}: {1}".format(MASK_FILE, ", ".join("{0} {1}x{2}".format(name, m.shape[1], m.shape[0])
+                                                       for name, m in sorted(masks.items()))))
@@ -0,0 +1,112 @@
+"""
+Evaluate a generation on several CPU cores.
+
+The population is split into shards and every worker process plays its own
+headless game with the same pipe seed. Birds never interact, so each genome
+gets the same fitness it would get in the single process eval_genomes with
+train.SEED set to the same value, and genomes carried over unchanged from
+the last generation get their fitness from a train.FitnessCache as there.
+The settings of train a game depends on (train.GAME_SETTINGS) go to the
+workers with every shard, so they hold for spawned workers as well.
+"""
+import time
+from multiprocessing import Pool
+
+import train
+from simulation import get_course
+
+
+def eval_shard(genomes, config, seed, course_file=None, settings=None):
+    """
+    play one headless game with a shard of the population
+    :param genomes: list of (genome_id, genome)
+    :param config: neat config
+    :param seed: pipe seed shared by every shard
+    :param course_file: optional .npy file the course is memory mapped from
+    :param settings: train.game_settings() of the parent, None keeps this process' own
+    :return: (list of fitness, frames simulated, bird steps, seconds taken, why the game ended)
+    """
+    start = time.perf_counter()
+    if settings is not None:
+        train.apply_settings(settings)          # budgets and decision interval as the parent set them
+    course = get_course(seed, course_file)      # built once per worker, reused every generation
+    frames, bird_steps, reason = train.play(genomes, config, False, course)
+    return [genome.fitness for genome_id, genome in genomes], frames, bird_steps, time.perf_counter() - start, reason
+
+
+class ParallelEvaluator(object):
+    """
+    Drop in fitness function for Population.run, used like neat.ParallelEvaluator:
+
+        with ParallelEvaluator(8, seed=0) as pe:
+            winner = p.run(pe.evaluate, 50)
+    """
+
+    def __init__(self, num_workers, seed=0, timeout=None, verbose=True, course_file=None):
+        """
+        :param num_workers: number of worker processes (and shards)
+        :param seed: pipe seed every worker plays
+        :param course_file: optional .npy file workers memory map the course from
+        :param timeout: seconds to wait for a shard, None waits forever
+        :param verbose: print each worker's throughput every generation
+        """
+        self.num_workers = num_workers
+        self.seed = seed
+        self.course_file = course_file
+        self.timeout = timeout
+        self.verbose = verbose
+        self.pool = Pool(num_workers)
+        self.fitness_cache = train.FitnessCache()
+        self.last_stats = []      # (birds, frames, bird steps, seconds, stop reason) per shard of the last generation
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def close(self):
+        """
+        stop the worker processes
+        :return: None
+        """
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __del__(self):
+        if self.pool is not None:
+            self.pool.terminate()
+
+    def evaluate(self, genomes, config):
+        """
+        set the fitness of every genome, same signature as eval_genomes
+        :param genomes: list of (genome_id, genome)
+        :param config: neat config
+        :return: None
+        """
+        genomes = list(genomes)
+        settings = train.game_settings()
+        cached = train.FITNESS_CACHE and train.fitness_cacheable(config)
+        unplayed = self.fitness_cache.lookup(genomes, train.game_key(self.seed, self.course_file)) if cached else genomes
+        shards = [unplayed[i::self.num_workers] for i in range(self.num_workers)]
+        shards = [shard for shard in shards if shard]
+        jobs = [self.pool.apply_async(eval_shard, (shard, config, self.seed, self.course_file, settings)) for shard in shards]
+
+        self.last_stats = []
+        for worker, (job, shard) in enumerate(zip(jobs, shards)):
+            fitnesses, frames, bird_steps, elapsed, reason = job.get(timeout=self.timeout)
+            for (genome_id, genome), fitness in zip(shard, fitnesses):
+                genome.fitness = fitness          # workers only had copies of the genomes
+            self.last_stats.append((len(shard), frames, bird_steps, elapsed, reason))
+            if self.verbose:
+                print("worker {0}: {1} birds, {2} frames in {3:.2f}s ({4:.0f} frames/sec, {5:.0f} bird-steps/sec), "
+                      "stopped: {6}".format(worker, len(shard), frames, elapsed, frames / max(elapsed, 1e-9),
+                                            bird_steps / max(elapsed, 1e-9), reason))
+        if cached:
+            self.fitness_cache.update()
+            if self.verbose:
+                print("Fitness cache: {0} of {1} genomes unchanged, not played".format(
+                    self.fitness_cache.hits, len(genomes)))
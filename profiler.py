@@ -0,0 +1,147 @@
+"""
+Where does a generation's time go? FrameProfiler times each phase of the
+training frame loop and counts what happened, and reports it per
+generation like the other NEAT reporters:
+
+    profiler = FrameProfiler(csv_path="phases.csv")
+    p.add_reporter(profiler)
+    train.PROFILER = profiler
+
+play() only calls into the profiler when one is set, so leaving it off
+costs a handful of `if` checks per frame.
+"""
+import csv
+import json
+import os
+import time
+
+import neat
+
+
+class FrameProfiler(neat.reporting.BaseReporter):
+    """
+    Per-phase timing and counters of the frame loop in train.play
+    """
+    PHASES = ("move", "activate", "collide", "pipes", "other", "draw")
+    COUNTERS = ("alive", "collisions", "pipes")
+
+    def __init__(self, csv_path=None, json_path=None, keep_frames=False, verbose=True):
+        """
+        :param csv_path: append one summary row per generation to this file
+        :param json_path: write every generation (with per-frame rows if kept) to this file
+        :param keep_frames: keep the timing and counters of every frame, not only totals
+        :param verbose: print a one line breakdown after every generation
+        :return: None
+        """
+        self.csv_path = csv_path
+        self.json_path = json_path
+        self.keep_frames = keep_frames
+        self.verbose = verbose
+        self.generation = None
+        self.generations = []     # one summary dict per finished generation
+        self.start_game()
+
+    def start_game(self):
+        """
+        reset the counts for a new game
+        :return: None
+        """
+        self.totals = dict((phase, 0.0) for phase in self.PHASES)
+        self.counts = dict((counter, 0) for counter in self.COUNTERS)
+        self.frames = []
+        self.frame_count = 0
+        self.max_alive = 0
+        self._frame = None
+
+    def start_frame(self):
+        """
+        :return: None
+        """
+        self._frame = dict((phase, 0.0) for phase in self.PHASES)
+        self._last = time.perf_counter()
+
+    def lap(self, phase):
+        """
+        charge the time since the previous lap to a phase
+        :param phase: one of PHASES
+        :return: None
+        """
+        now = time.perf_counter()
+        self._frame[phase] += now - self._last
+        self._last = now
+
+    def end_frame(self, alive, collisions, pipes):
+        """
+        :param alive: birds alive at the end of the frame
+        :param collisions: birds that hit a pipe this frame
+        :param pipes: pipes on screen
+        :return: None
+        """
+        self.lap("other")
+        for phase, seconds in self._frame.items():
+            self.totals[phase] += seconds
+        self.counts["alive"] += alive
+        self.counts["collisions"] += collisions
+        self.counts["pipes"] += pipes
+        self.max_alive = max(self.max_alive, alive)
+        self.frame_count += 1
+        if self.keep_frames:
+            row = dict(self._frame)
+            row.update(alive=alive, collisions=collisions, pipes=pipes)
+            self.frames.append(row)
+
+    def summary(self):
+        """
+        totals of the current game
+        :return: dict
+        """
+        frames = max(self.frame_count, 1)
+        total = sum(self.totals.values())
+        result = {"generation": self.generation, "frames": self.frame_count, "seconds": total,
+                  "max_alive": self.max_alive, "collisions": self.counts["collisions"],
+                  "mean_alive": self.counts["alive"] / frames, "mean_pipes": self.counts["pipes"] / frames}
+        for phase in self.PHASES:
+            result[phase + "_seconds"] = self.totals[phase]
+            result[phase + "_ms_per_frame"] = 1000.0 * self.totals[phase] / frames
+        return result
+
+    def write_csv(self, summary):
+        """
+        append a summary row, writing the header for a new file
+        :param summary: dict from summary()
+        :return: None
+        """
+        new_file = not os.path.exists(self.csv_path)
+        with open(self.csv_path, "a", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(summary.keys()))
+            if new_file:
+                writer.writeheader()
+            writer.writerow(summary)
+
+    def write_json(self):
+        """
+        write every generation so far
+        :return: None
+        """
+        with open(self.json_path, "w") as f:
+            json.dump(self.generations, f)
+
+    def start_generation(self, generation):
+        self.generation = generation
+
+    def post_evaluate(self, config, population, species, best_genome):
+        summary = self.summary()
+        if self.keep_frames:
+            summary["per_frame"] = self.frames
+        self.generations.append(summary)
+
+        row = dict((k, v) for k, v in summary.items() if k != "per_frame")
+        if self.csv_path:
+            self.write_csv(row)
+        if self.json_path:
+            self.write_json()
+        if self.verbose and summary["seconds"] > 0:
+            print("Frame time: " + ", ".join("{0} {1:.0%}".format(phase, summary[phase + "_seconds"] / summary["seconds"])
+                                             for phase in self.PHASES) +
+                  " ({0:.3f} ms/frame, {1} collisions)".format(1000.0 * summary["seconds"] / max(summary["frames"], 1),
+                                                              summary["collisions"]))
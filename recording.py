@@ -0,0 +1,364 @@
+"""
+Binary traces of training games, to look at a bad generation again
+without re-simulating it.
+
+TraceRecorder streams the state of every frame of train.play to a file:
+the y, tilt, wing frame and alive flag of the birds, the pipes, the base
+and the score. Every frame is one fixed-width record, written out in
+batches as the game goes, and TraceReader memory maps them; seeking to a
+frame is an index, and drawing it goes through draw_window without
+touching a network.
+
+The file is a header followed by segments. A segment holds the birds of
+the rows play() is stepping: all of them at first, only the survivors
+after Flock.compact, the last bird in play_solo. It starts with the slot
+of each row, then one record per frame, so a record costs bytes for the
+birds still being stepped, not for the whole population.
+
+    python train.py                       # with TRACE_DIR = "traces" in train.py
+    python recording.py traces/gen-0007.trace --frame 1200
+    python recording.py traces/gen-0007.trace --info
+
+In the replay window space pauses, left/right step one frame and up/down
+jump 100 frames.
+"""
+import argparse
+import bisect
+import os
+import struct
+
+import numpy as np
+
+from simulation import *
+
+MAGIC = b"FBTR"
+VERSION = 1
+HEADER = struct.Struct(">4sHIIHH")     # magic, version, generation, bird slots, pipe slots, bird x
+SEGMENT = struct.Struct(">II")         # rows, frames (OPEN until the segment is over)
+OPEN = 0xFFFFFFFF                      # frames of a segment still being written: as many as the file holds
+MAX_PIPES = 3                          # pipes on screen at once never exceed this
+
+
+def frame_dtype(rows, max_pipes=MAX_PIPES):
+    """
+    the record of one frame
+    :param rows: birds in the segment
+    :param max_pipes: pipe slots
+    :return: numpy structured dtype
+    """
+    return np.dtype([("score", "<u2"), ("pipe_ind", "u1"), ("num_pipes", "u1"),
+                     ("base_x", "<i2", 2),
+                     ("pipe_x", "<i2", max_pipes), ("pipe_height", "<i2", max_pipes),
+                     ("y", "<f4", rows), ("tilt", "i1", rows), ("img_index", "u1", rows), ("alive", "u1", rows)])
+
+
+class TraceRecorder:
+    """
+    Writes one game to a trace file. Frames are gathered in column buffers
+    of FLUSH_FRAMES rows and turned into records and written when they
+    fill up, so a frame only costs a few array copies.
+    """
+    FLUSH_FRAMES = 256
+    PADDING = [0] * (5 + 2 * MAX_PIPES)
+
+    def __init__(self, path, num_slots, generation=0, bird_x=230):
+        """
+        :param path: trace file to write
+        :param num_slots: birds of the game
+        :param generation: shown by the replay
+        :param bird_x: x of every bird
+        :return: None
+        """
+        self.path = path
+        self.num_slots = num_slots
+        self.frames = 0                 # frames recorded
+        self.slot_ids = None            # slots of the rows of the current segment
+        self.segment_offset = None      # file offset of the current segment's header
+        self.segment_frames = 0
+        self.rest = []                  # per buffered frame: score, pipe_ind, num_pipes, base x1, x2, then x, height per pipe
+        self.solo = None                # per buffered frame of a play_solo segment: y, tilt, img_index, alive
+        self.file = open(path, "wb")
+        self.file.write(HEADER.pack(MAGIC, VERSION, generation, num_slots, MAX_PIPES, bird_x))
+
+    def record(self, birds, slot_ids, pipes, base, score, pipe_ind):
+        """
+        add a frame of play()
+        :param birds: BirdBatch
+        :param slot_ids: slot of every row of birds
+        :param pipes: PipePool
+        :param base: Base object
+        :param score: score of the game
+        :param pipe_ind: index of the pipe the birds look at
+        :return: None
+        """
+        if slot_ids is not self.slot_ids:          # Flock.compact hands out a new array
+            self.start_segment(slot_ids)
+        i = len(self.rest)
+        self.y[i] = birds.y
+        self.tilt[i] = birds.tilt
+        self.img_index[i] = birds.img_index
+        self.alive[i] = birds.alive
+        self._write(pipes, base, score, pipe_ind)
+
+    def record_one(self, slot, bird, alive, pipes, base, score, pipe_ind):
+        """
+        add a frame of play_solo()
+        :param slot: slot of the bird
+        :param bird: Bird object
+        :param alive: whether it is
+        :return: None
+        """
+        if self.solo is None or self.slot_ids[0] != slot:
+            self.start_segment(np.array([slot]))
+            self.solo = []
+        self.solo.append((bird.y, bird.tilt, bird.img_index, alive))      # plain tuples, cheaper than array stores
+        self._write(pipes, base, score, pipe_ind)
+
+    def _write(self, pipes, base, score, pipe_ind):
+        row = [score, pipe_ind, len(pipes), base.x1, base.x2]
+        for pipe in pipes:
+            row += (pipe.x, pipe.height)
+        row += self.PADDING[len(row):]
+        self.rest.append(row)
+        self.frames += 1
+        self.segment_frames += 1
+        if len(self.rest) == self.FLUSH_FRAMES:
+            self.flush()
+
+    def start_segment(self, slot_ids):
+        """
+        finish the current segment and start one for other rows
+        :param slot_ids: slot of every row
+        :return: None
+        """
+        self.end_segment()
+        self.slot_ids = slot_ids
+        self.solo = None
+        rows = len(slot_ids)
+        self.dtype = frame_dtype(rows)
+        self.y = np.zeros((self.FLUSH_FRAMES, rows), np.float32)
+        self.tilt = np.zeros((self.FLUSH_FRAMES, rows), np.int8)
+        self.img_index = np.zeros((self.FLUSH_FRAMES, rows), np.uint8)
+        self.alive = np.zeros((self.FLUSH_FRAMES, rows), np.uint8)
+        self.segment_offset = self.file.tell()
+        self.segment_frames = 0
+        self.file.write(SEGMENT.pack(rows, OPEN))
+        self.file.write(np.asarray(slot_ids, "<u4").tobytes())
+
+    def end_segment(self):
+        """
+        write the buffered frames of the current segment and its frame count
+        :return: None
+        """
+        if self.segment_offset is None:
+            return
+        self.flush()
+        end = self.file.tell()
+        self.file.seek(self.segment_offset)
+        self.file.write(SEGMENT.pack(len(self.slot_ids), self.segment_frames))
+        self.file.seek(end)
+        self.segment_offset = None
+
+    def flush(self):
+        """
+        write the buffered frames
+        :return: None
+        """
+        count = len(self.rest)
+        if not count:
+            return
+        rest = np.array(self.rest, np.int64)
+        records = np.empty(count, self.dtype)
+        records["score"] = rest[:, 0]
+        records["pipe_ind"] = rest[:, 1]
+        records["num_pipes"] = rest[:, 2]
+        records["base_x"] = rest[:, 3:5]
+        records["pipe_x"] = rest[:, 5::2]
+        records["pipe_height"] = rest[:, 6::2]
+        if self.solo:
+            birds = np.array(self.solo)
+            self.y[:count, 0] = birds[:, 0]
+            self.tilt[:count, 0] = birds[:, 1]
+            self.img_index[:count, 0] = birds[:, 2]
+            self.alive[:count, 0] = birds[:, 3]
+            self.solo = []
+        records["y"] = self.y[:count]
+        records["tilt"] = self.tilt[:count]
+        records["img_index"] = self.img_index[:count]
+        records["alive"] = self.alive[:count]
+        self.file.write(records.data)
+        self.rest = []
+
+    def close(self):
+        """
+        write what is left and close the file
+        :return: None
+        """
+        if not self.file.closed:
+            self.end_segment()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TraceReader:
+    """
+    A trace file memory mapped, one array of records per segment. A file
+    cut short while being written reads as the frames it has.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: trace file
+        :return: None
+        """
+        self.path = path
+        size = os.path.getsize(path)
+        with open(path, "rb") as f:
+            magic, version, self.generation, self.num_slots, max_pipes, self.bird_x = HEADER.unpack(f.read(HEADER.size))
+            if magic != MAGIC:
+                raise ValueError("{0} is not a trace".format(path))
+            if version != VERSION:
+                raise ValueError("{0} is trace format {1}, this version reads {2}".format(path, version, VERSION))
+
+            self.segments = []          # (first frame, slot of every row, records)
+            self.starts = []
+            total = 0
+            offset = HEADER.size
+            while offset + SEGMENT.size <= size:
+                f.seek(offset)
+                rows, frames = SEGMENT.unpack(f.read(SEGMENT.size))
+                if offset + SEGMENT.size + 4 * rows > size:         # cut short in the slot list
+                    break
+                slot_ids = np.frombuffer(f.read(4 * rows), "<u4")
+                offset += SEGMENT.size + 4 * rows
+                dtype = frame_dtype(rows, max_pipes)
+                available = max(0, (size - offset) // dtype.itemsize)
+                frames = available if frames == OPEN else min(frames, available)
+                if frames:
+                    self.segments.append((total, slot_ids, np.memmap(path, dtype, "r", offset, (frames,))))
+                    self.starts.append(total)
+                total += frames
+                offset += frames * dtype.itemsize
+        self.num_frames = total
+
+    def __len__(self):
+        return self.num_frames
+
+    def record(self, i):
+        """
+        :param i: frame index
+        :return: (slot of every row, the frame's record)
+        """
+        if not 0 <= i < self.num_frames:
+            raise IndexError("frame {0} of a {1} frame trace".format(i, self.num_frames))
+        start, slot_ids, records = self.segments[bisect.bisect_right(self.starts, i) - 1]
+        return slot_ids, records[i - start]
+
+    def alive(self, i):
+        """
+        :param i: frame index
+        :return: bool array over slots
+        """
+        slot_ids, record = self.record(i)
+        alive = np.zeros(self.num_slots, bool)
+        alive[slot_ids] = record["alive"].astype(bool)
+        return alive
+
+    def alive_counts(self):
+        """
+        :return: live birds of every frame, int array
+        """
+        return np.concatenate([records["alive"].sum(axis=1) for start, slot_ids, records in self.segments]) \
+            if self.segments else np.zeros(0, np.int64)
+
+    def state(self, i):
+        """
+        a frame as game objects, for draw_window
+        :param i: frame index
+        :return: (list of live Bird, list of Pipe, Base, score, pipe_ind)
+        """
+        slot_ids, record = self.record(i)
+        birds = []
+        for y, tilt, img_index, alive in zip(record["y"].tolist(), record["tilt"].tolist(),
+                                             record["img_index"].tolist(), record["alive"].tolist()):
+            if alive:
+                bird = Bird(self.bird_x, y)
+                bird.tilt = tilt
+                bird.img_index = img_index
+                birds.append(bird)
+        num_pipes = int(record["num_pipes"])
+        pipes = [Pipe(x, height) for x, height in
+                 zip(record["pipe_x"][:num_pipes].tolist(), record["pipe_height"][:num_pipes].tolist())]
+        base = Base(FLOOR)
+        base.x1, base.x2 = record["base_x"].tolist()
+        return birds, pipes, base, int(record["score"]), int(record["pipe_ind"])
+
+
+def replay(path, frame=0, fps=30):
+    """
+    watch a trace from a frame on; space pauses, left/right step a frame, up/down jump 100
+    :param path: trace file
+    :param frame: frame to start at
+    :param fps: frame cap
+    :return: None
+    """
+    import pygame
+    import FlappyBird
+
+    reader = TraceReader(path)
+    if not len(reader):
+        print("{0} has no frames".format(path))
+        return
+    clock = pygame.time.Clock()
+    paused = False
+    frame = max(0, min(frame, len(reader) - 1))
+    while True:
+        clock.tick(fps)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+            if event.type == pygame.KEYDOWN:
+                step = {pygame.K_LEFT: -1, pygame.K_RIGHT: 1, pygame.K_DOWN: -100, pygame.K_UP: 100}
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key in step:
+                    frame = max(0, min(frame + step[event.key], len(reader) - 1))
+                    paused = True
+        birds, pipes, base, score, pipe_ind = reader.state(frame)
+        FlappyBird.draw_window(FlappyBird.WIN, birds, pipes, base, score, reader.generation, pipe_ind)
+        pygame.display.set_caption("{0}  frame {1}/{2}{3}".format(
+            os.path.basename(path), frame + 1, len(reader), "  (paused)" if paused else ""))
+        if not paused and frame < len(reader) - 1:
+            frame += 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", help="trace file")
+    parser.add_argument("--frame", type=int, default=0, help="frame to start at")
+    parser.add_argument("--fps", type=int, default=30, help="frame cap")
+    parser.add_argument("--info", action="store_true", help="print what the trace holds instead of replaying it")
+    args = parser.parse_args(argv)
+    if args.info:
+        reader = TraceReader(args.path)
+        size = os.path.getsize(args.path)
+        print("{0}: generation {1}, {2} birds, {3} frames in {4} segments, {5} bytes".format(
+            args.path, reader.generation - 1, reader.num_slots, len(reader), len(reader.segments), size))
+        if len(reader):
+            print("{0:.1f} KB per 1000 frames".format(size / len(reader) * 1000 / 1024.0))
+            alive = reader.alive_counts()
+            print("final score {0}, birds alive at frames 1/100/1000/last: {1}".format(
+                reader.state(len(reader) - 1)[3],
+                "/".join(str(int(alive[min(f, len(reader)) - 1])) for f in (1, 100, 1000, len(reader)))))
+        return reader
+    replay(args.path, args.frame, args.fps)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,15 +1,9 @@
 from FlappyBird import *
 
-import neat
 import pickle
-
-genome_path = os.path.join(os.path.dirname(__file__), 'ai.pkl')
-genome = pickle.load(open(genome_path, 'rb'))
+import sys
 
 local_dir = os.path.dirname(__file__)
-config_path = os.path.join(local_dir, 'config-feedforward.txt')
-config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
-                            neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
 
 
 def draw_test_window(win, bird, pipes, base, score, pipe_ind):
@@ -39,21 +33,45 @@ def draw_test_window(win, bird, pipes, base, score, pipe_ind):
 
     pygame.display.update()
 
-def main(genome, config):
+def game_over(net):
+    """
+    close the window and exit, after the decision cache's numbers if the bird has one
+    :param net: the bird's network
+    :return: None
+    """
+    if hasattr(net, "stats"):       # a decision_cache.CachedNetwork
+        print("Decision cache: {0}".format(net.stats))
+    pygame.quit()
+    quit()
+
+def main(genome, config, fps=30, decision_interval=1):
+    """
+    watch a trained bird play until it dies
+    :param genome: genome, or an already built network (FeedForwardNetwork, StandaloneNetwork or CachedNetwork)
+    :param config: neat config, only needed for a genome
+    :param fps: frame cap
+    :param decision_interval: the bird decides every this many frames, as train.DECISION_INTERVAL
+    :return: None
+    """
     score = 0
+    frames = 0
 
     bird = Bird(230, 350)     # ADDING BIRD
     base = Base(FLOOR)        # ADDING BASE
-    pipes = [Pipe(700)]       # ADDING PIPES
+    pipes = PipePool()        # ADDING PIPES
+    pipes.spawn(700)
     #win = pygame.display.set_mode(WIN_WIDTH, WIN_HEIGHT)
 
-    ge = genome
-    net = neat.nn.FeedForwardNetwork.create(ge, config)
+    net = genome
+    if not hasattr(net, "activate"):
+        import neat               # a standalone.py export plays without it
+        net = neat.nn.FeedForwardNetwork.create(genome, config)
 
     clock = pygame.time.Clock()
     run = True
     while run:
-        clock.tick(30)
+        clock.tick(fps)
+        frames += 1
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 run = False
@@ -63,7 +81,7 @@ def main(genome, config):
 
         ############  PIPE CHECK  ######################################
         pipe_ind = 0  # pipe index is set to zero, we are focusing on one pipe at a time
-        if len(pipes) > 1 and bird.x > pipes[0].x + pipes[0].PIPE_TOP.get_width():  # if we have passed the pipe, then use focus on second pipe
+        if len(pipes) > 1 and bird.x > pipes[0].x + Pipe.WIDTH:  # if we have passed the pipe, then use focus on second pipe
             pipe_ind = 1
 
         ################################################################
@@ -72,10 +90,11 @@ def main(genome, config):
         bird.move()
 
         # send bird location, top pipe location and bottom pipe location and determine from network whether to jump or not
-        output = net.activate((bird.y, abs(bird.y - pipes[pipe_ind].height), abs(bird.y - pipes[pipe_ind].bottom)))
+        if (frames - 1) % decision_interval == 0:
+            output = net.activate((bird.y, abs(bird.y - pipes[pipe_ind].height), abs(bird.y - pipes[pipe_ind].bottom)))
 
-        if output[0] > 0.5:  # we use a tanh activation function so result will be between -1 and 1. if over 0.5 jump
-            bird.jump()
+            if output[0] > 0.5:  # we use a tanh activation function so result will be between -1 and 1. if over 0.5 jump
+                bird.jump()
 
         ################################################################
 
@@ -86,10 +105,9 @@ def main(genome, config):
             pipe.move()   # MOVING PIPE
 
             if pipe.collide(bird, WIN):
-                pygame.quit()
-                quit()
+                game_over(net)
                 break
-            if pipe.x + pipe.PIPE_TOP.get_width() < 0:  # if pipe is completely off screen
+            if pipe.x + Pipe.WIDTH < 0:  # if pipe is completely off screen
                 rem.append(pipe)                        # add pipe to remove list
 
             if not pipe.passed and pipe.x < bird.x:
@@ -97,15 +115,14 @@ def main(genome, config):
                 add_pipe = True
         if add_pipe:
             score += 1
-            pipes.append(Pipe(WIN_WIDTH))  # add new pipe to pipes list
+            pipes.spawn(WIN_WIDTH)  # add new pipe, reusing an old one
         for r in rem:               # once passed a pipe remove previous pipe from remove list
-            pipes.remove(r)
+            pipes.recycle(r)
         ################################################################
 
         ############  EXIT GAME WHEN BIRD HITS FLOOR  ##################
-        if bird.y + bird.img.get_height() - 10 >= FLOOR or bird.y < -50:  # bird hit the floor
-            pygame.quit()
-            quit()
+        if bird.hit_bounds():  # bird hit the floor
+            game_over(net)
             break
         ##############################################################
 
@@ -113,4 +130,14 @@ def main(genome, config):
         draw_test_window(WIN, bird, pipes, base, score, pipe_ind)
 
 if __name__ == '__main__':
+    genome_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(local_dir, 'ai.pkl')
+    if genome_path.endswith('.py'):     # exported by standalone.py, no config needed
+        import standalone
+        genome, config = standalone.load(genome_path), None
+    else:
+        import neat
+        config_path = os.path.join(local_dir, 'config-feedforward.txt')
+        config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                    neat.DefaultSpeciesSet, neat.DefaultStagnation, config_path)
+        genome = pickle.load(open(genome_path, 'rb'))
     main(genome, config)
\ No newline at end of file
@@ -0,0 +1,684 @@
+"""
+Headless simulation core of the game.
+
+Everything needed to step the game (bird physics, pipes, the moving base and
+pixel-perfect collision) lives here and only needs the standard library and
+NumPy. No pygame display, surface or font is created, so training can run on
+machines without a screen. Rendering lives in FlappyBird.py and is only
+imported when something is actually drawn.
+"""
+import os
+import random
+import struct
+
+import numpy as np
+
+WIN_WIDTH = 600           # Dimensions of UI
+WIN_HEIGHT = 800
+FLOOR = 730
+
+IMG_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "imgs")
+MASK_FILE = os.path.join(IMG_DIR, "masks.npz")   # collision masks of the sprites, written by make_masks.py
+
+
+def png_size(path):
+    """
+    Read the width and height of a png from its header only
+    :param path: path to the png file
+    :return: (width, height)
+    """
+    with open(path, "rb") as f:
+        return struct.unpack(">II", f.read(24)[16:24])
+
+
+def mask_overlap(mask, other, offset):
+    """
+    Same test as pygame.mask.Mask.overlap: do two masks share a set pixel
+    :param mask: 2d bool array
+    :param other: 2d bool array
+    :param offset: (x, y) position of other relative to mask
+    :return: Bool
+    """
+    ox, oy = offset
+    x0, y0 = max(0, ox), max(0, oy)
+    x1 = min(mask.shape[1], ox + other.shape[1])
+    y1 = min(mask.shape[0], oy + other.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return False
+    return bool((mask[y0:y1, x0:x1] & other[y0 - oy:y1 - oy, x0 - ox:x1 - ox]).any())
+
+
+# sprite dimensions after scale2x, read from the png headers so no image has to be decoded
+BIRD_WIDTH, BIRD_HEIGHT = (2 * v for v in png_size(os.path.join(IMG_DIR, "bird1.png")))
+PIPE_WIDTH, PIPE_HEIGHT = (2 * v for v in png_size(os.path.join(IMG_DIR, "pipe.png")))
+BASE_WIDTH, BASE_HEIGHT = (2 * v for v in png_size(os.path.join(IMG_DIR, "base.png")))
+
+_masks = {}
+
+
+def get_masks():
+    """
+    Collision masks of the scaled up sprites, the same pixels as
+    pygame.mask.from_surface(pygame.transform.scale2x(pygame.image.load(...))),
+    loaded from MASK_FILE on first use
+    :return: dict with "bird" (list of 3 frames), "pipe_top" and "pipe_bottom", 2d bool arrays indexed [y, x]
+    """
+    if not _masks:
+        with np.load(MASK_FILE) as saved:
+            _masks["bird"] = [saved["bird" + str(x)] for x in range(1, 4)]
+            _masks["pipe_bottom"] = saved["pipe"]
+        _masks["pipe_top"] = _masks["pipe_bottom"][::-1]    # top pipe is the flipped image
+    return _masks
+
+
+FAST_COLLISION = True     # BirdBatch.collide uses the precomputed tables below instead of per bird masks
+_collision_tables = {}
+
+
+def collision_table(frame, part, dx):
+    """
+    Pixel perfect collision of one bird frame against one pipe part for
+    every vertical offset at once. Built from the masks on first use, then
+    a collision test is a single lookup.
+    :param frame: bird animation frame (0-2)
+    :param part: "pipe_top" or "pipe_bottom"
+    :param dx: pipe x minus bird x (int)
+    :return: bool array, entry oy + PIPE_HEIGHT - 1 is True when the masks
+             overlap with the pipe oy pixels below the bird's top edge
+    """
+    key = (frame, part, dx)
+    table = _collision_tables.get(key)
+    if table is None:
+        masks = get_masks()
+        bird = masks["bird"][frame]
+        pipe = masks[part]
+        table = np.zeros(PIPE_HEIGHT + BIRD_HEIGHT - 1, bool)
+        x0, x1 = max(0, dx), min(BIRD_WIDTH, dx + PIPE_WIDTH)    # shared columns
+        if x0 < x1:
+            # rows[i, j]: does bird row i share a set pixel with pipe row j
+            rows = bird[:, x0:x1].astype(np.float32) @ pipe[:, x0 - dx:x1 - dx].T.astype(np.float32) > 0
+            pipe_rows = np.arange(PIPE_HEIGHT)
+            for i in range(BIRD_HEIGHT):
+                table[i - pipe_rows + PIPE_HEIGHT - 1] |= rows[i]    # bird row i meets pipe row j at oy = i - j
+        _collision_tables[key] = table
+    return table
+
+
+_collision_grids = {}
+
+
+def collision_grid(part):
+    """
+    collision_table of every bird frame for every dx at which the pipe part
+    is level with the bird, stacked so birds facing different pipes can be
+    tested with one lookup
+    :param part: "pipe_top" or "pipe_bottom"
+    :return: bool array indexed [frame, dx + PIPE_WIDTH - 1, oy + PIPE_HEIGHT - 1]
+    """
+    grid = _collision_grids.get(part)
+    if grid is None:
+        frames = len(get_masks()["bird"])
+        grid = np.array([[collision_table(frame, part, dx) for dx in range(1 - PIPE_WIDTH, BIRD_WIDTH)]
+                         for frame in range(frames)])
+        _collision_grids[part] = grid
+    return grid
+
+
+class Course:
+    """
+    A fixed sequence of pipe heights generated from a seed. Every game
+    played on the same course sees the same pipes, so runs are
+    reproducible and comparable. Pipe number i gets heights[i], wrapping
+    around after the last one.
+    """
+    LENGTH = 4096             # pipes before the course repeats
+
+    def __init__(self, heights, seed=None):
+        """
+        :param heights: uint16 array of pipe heights (may be a memory map)
+        :param seed: seed the heights were generated from, if known
+        :return: None
+        """
+        self.heights = heights
+        self.seed = seed
+
+    @staticmethod
+    def generate(seed, length=LENGTH):
+        """
+        draw the heights from a seeded generator, same range as Pipe.set_height
+        :param seed: int
+        :param length: number of pipes
+        :return: Course
+        """
+        rng = np.random.default_rng(seed)
+        return Course(rng.integers(50, 450, length, dtype=np.uint16), seed)
+
+    @staticmethod
+    def load(path):
+        """
+        memory map a course saved with save()
+        :param path: .npy file
+        :return: Course
+        """
+        return Course(np.load(path, mmap_mode="r"))
+
+    def save(self, path):
+        """
+        write the heights to a .npy file
+        :param path: .npy file
+        :return: None
+        """
+        np.save(path, np.asarray(self.heights))
+
+    def height(self, i):
+        """
+        height of the i-th pipe
+        :param i: pipe number (int)
+        :return: int
+        """
+        return int(self.heights[i % len(self.heights)])
+
+
+_courses = {}
+
+
+def course_path(path, seed):
+    """
+    the file one seed's course is kept in: the seed goes into the name, so a
+    file written for another seed is never taken for this one
+    :param path: .npy file name, e.g. course.npy
+    :param seed: int
+    :return: file name, e.g. course-7.npy
+    """
+    root, ext = os.path.splitext(path)
+    return "{0}-{1}{2}".format(root, seed, ext or ".npy")
+
+
+def get_course(seed, path=None):
+    """
+    Course for a seed, built once per process and reused by every
+    generation. With a path the heights are memory mapped from the seed's
+    file (course_path), which is written first if it does not exist yet.
+    :param seed: int
+    :param path: optional .npy file name
+    :return: Course
+    """
+    key = (seed, path)
+    if key not in _courses:
+        if path is not None:
+            path = course_path(path, seed)
+        if path is not None and os.path.exists(path):
+            course = Course.load(path)
+            course.seed = seed
+        else:
+            course = Course.generate(seed)
+            if path is not None:
+                course.save(path)
+                course = Course.load(path)
+                course.seed = seed
+        _courses[key] = course
+    return _courses[key]
+
+
+class Bird:
+    """
+    Bird class representing the flappy bird
+    """
+    MAX_ROTATION = 25   # how much bird tilt in degrees
+    ROT_VEL = 20        # how much we rotate in every frame or every time the bird moves
+    ANIMATION_TIME = 5  # how long we show bird animation
+    WIDTH = BIRD_WIDTH
+    HEIGHT = BIRD_HEIGHT
+
+    def __init__(self, x, y):
+        """
+        Initialize the object
+        :param x: starting x pos (int)
+        :param y: starting y pos (int)
+        :return: None
+        """
+        self.x = x
+        self.y = y
+        self.tilt = 0             # degrees to tilt, how much is tilted
+        self.tick_count = 0       # physics of bird
+        self.vel = 0
+        self.height = self.y
+        self.img_count = 0        # to know which image we are showing
+        self.img_index = 0        # index of the current animation frame
+
+    def jump(self):
+        """
+        make the bird jump
+        :return: None
+        """
+        self.vel = -10.5          # random number selected, negative velocity to go upwards
+        self.tick_count = 0       # tracks when we last jumped
+        self.height = self.y      # where the bird jumped from
+
+    def move(self):
+        """
+        make the bird move
+        :return: None
+        """
+        self.tick_count += 1     # denotes we have moved
+
+        # for downward acceleration   s = ut + 0.5 at^2
+        displacement = self.vel*(self.tick_count) + 0.5*(3)*(self.tick_count)**2  # calculate displacement
+        # moves in a parabolic path --> -10.5 + 1.5 = -9 --> -7 --> -5 --> -3 --> 0 --> 2
+
+        # terminal velocity; ensures we are not moving too far either up or down
+        if displacement >= 16:
+            displacement = (displacement/abs(displacement)) * 16
+
+        if displacement < 0:
+            displacement -= 2
+
+        self.y = self.y + displacement                     # change y position
+
+        if displacement < 0 or self.y < self.height + 50:  # tilt up
+            if self.tilt < self.MAX_ROTATION:
+                self.tilt = self.MAX_ROTATION
+        else:                                              # tilt down
+            if self.tilt > -90:
+                self.tilt -= self.ROT_VEL
+
+        self.animate()
+
+    def animate(self):
+        """
+        advance the wing animation. The frame decides the collision mask,
+        so it is part of the simulation rather than of drawing
+        :return: None
+        """
+        self.img_count += 1      # how many times we have shown image
+
+        # For animation of bird, loop through three images
+        if self.img_count <= self.ANIMATION_TIME:          # count < 5     show 1st image
+            self.img_index = 0
+        elif self.img_count <= self.ANIMATION_TIME*2:      # count < 10
+            self.img_index = 1
+        elif self.img_count <= self.ANIMATION_TIME*3:      # count < 15
+            self.img_index = 2
+        elif self.img_count <= self.ANIMATION_TIME*4:      # count < 20
+            self.img_index = 1
+        elif self.img_count == self.ANIMATION_TIME*4 + 1:  # count < 21    show 1st image
+            self.img_index = 0
+            self.img_count = 0                             # reset the count
+
+        # so when bird is nose diving it isn't flapping, display 2nd image for this
+        if self.tilt <= -80:
+            self.img_index = 1
+            self.img_count = self.ANIMATION_TIME*2  # when we jump up start at count = 10; display 2nd image
+
+    def hit_bounds(self):
+        """
+        has the bird hit the floor or flown off the top of the screen
+        :return: Bool
+        """
+        return self.y + self.HEIGHT - 10 >= FLOOR or self.y < -50
+
+    def draw(self, win):
+        """
+        draw the bird
+        :param win: pygame window or surface
+        :return: None
+        """
+        from FlappyBird import draw_bird    # rendering is only loaded when something is drawn
+        draw_bird(win, self)
+
+    def get_mask(self):
+        """
+        gets the mask for the current image of the bird
+        :return: 2d bool array
+        """
+        return get_masks()["bird"][self.img_index]
+
+
+class BirdBatch:
+    """
+    A whole population of birds stored as NumPy arrays (one entry per slot)
+    and stepped with the same rules as Bird.move and Bird.jump. Dead birds
+    stay in their slot and are frozen by the alive mask.
+    """
+    # image shown for each animation count 0..21, see Bird.animate
+    ANIMATION_FRAMES = np.array([0] + [0]*Bird.ANIMATION_TIME + [1]*Bird.ANIMATION_TIME +
+                                [2]*Bird.ANIMATION_TIME + [1]*Bird.ANIMATION_TIME + [0])
+
+    def __init__(self, size, x, y):
+        """
+        Initialize the batch, all birds start at the same position
+        :param size: number of birds (int)
+        :param x: starting x pos shared by every bird (int)
+        :param y: starting y pos (int)
+        :return: None
+        """
+        self.x = x
+        self.y = np.full(size, y, np.float64)
+        self.tilt = np.zeros(size, np.int64)
+        self.tick_count = np.zeros(size, np.int64)
+        self.vel = np.zeros(size, np.float64)
+        self.height = self.y.copy()
+        self.img_count = np.zeros(size, np.int64)
+        self.img_index = np.zeros(size, np.int64)
+        self.alive = np.ones(size, bool)
+
+    def __len__(self):
+        return len(self.alive)
+
+    def jump(self, mask):
+        """
+        make the selected birds jump
+        :param mask: bool array, True for birds that jump
+        :return: None
+        """
+        mask = mask & self.alive
+        self.vel[mask] = -10.5
+        self.tick_count[mask] = 0
+        self.height[mask] = self.y[mask]
+
+    def move(self):
+        """
+        move every live bird one frame
+        :return: None
+        """
+        alive = self.alive
+        tick_count = np.where(alive, self.tick_count + 1, self.tick_count)
+
+        displacement = self.vel*tick_count + 0.5*(3)*tick_count**2
+        displacement = np.where(displacement >= 16, 16.0, displacement)       # terminal velocity
+        displacement = np.where(displacement < 0, displacement - 2, displacement)
+
+        y = np.where(alive, self.y + displacement, self.y)
+        up = (displacement < 0) | (y < self.height + 50)
+        tilt = np.where(up, np.maximum(self.tilt, Bird.MAX_ROTATION),
+                        np.where(self.tilt > -90, self.tilt - Bird.ROT_VEL, self.tilt))
+
+        self.tick_count = tick_count
+        self.y = y
+        self.tilt = np.where(alive, tilt, self.tilt)
+        self.animate()
+
+    def animate(self):
+        """
+        advance the wing animation of every live bird, same steps as Bird.animate
+        :return: None
+        """
+        t = Bird.ANIMATION_TIME
+        count = self.img_count + 1
+        index = self.ANIMATION_FRAMES[count]           # which image each count shows
+        count = np.where(count == t*4 + 1, 0, count)   # reset the count
+
+        dive = self.tilt <= -80
+        index = np.where(dive, 1, index)
+        count = np.where(dive, t*2, count)
+
+        self.img_index = np.where(self.alive, index, self.img_index)
+        self.img_count = np.where(self.alive, count, self.img_count)
+
+    def hit_bounds(self):
+        """
+        which live birds have hit the floor or flown off the top of the screen
+        :return: bool array
+        """
+        return self.alive & ((self.y + Bird.HEIGHT - 10 >= FLOOR) | (self.y < -50))
+
+    def collide(self, pipe):
+        """
+        which live birds collide with a pipe
+        :param pipe: Pipe object
+        :return: bool array
+        """
+        hits = np.zeros(len(self.alive), bool)
+        if not FAST_COLLISION:
+            for i in np.flatnonzero(self.alive):
+                hits[i] = pipe.collide(self.bird(i))
+            return hits
+
+        dx = pipe.x - self.x
+        if dx >= Bird.WIDTH or dx + Pipe.WIDTH <= 0:    # pipe is not level with the birds
+            return hits
+
+        bird_y = np.round(self.y).astype(np.int64)
+        for part, edge in (("pipe_top", pipe.top), ("pipe_bottom", pipe.bottom)):
+            oy = edge - bird_y + PIPE_HEIGHT - 1         # table index of every bird's offset
+            near = self.alive & (oy >= 0) & (oy < PIPE_HEIGHT + BIRD_HEIGHT - 1)   # bounding boxes intersect
+            for frame in range(len(get_masks()["bird"])):
+                sel = near & (self.img_index == frame)
+                if sel.any():
+                    hits[sel] |= collision_table(frame, part, dx)[oy[sel]]
+        return hits
+
+    def collide_each(self, pipe_x, pipe_height):
+        """
+        which live birds collide with their own pipe, for birds that each
+        play a different game
+        :param pipe_x: int array, x of the pipe each bird is tested against
+        :param pipe_height: int array, height of that pipe's gap
+        :return: bool array
+        """
+        hits = np.zeros(len(self.alive), bool)
+        dx = pipe_x - self.x
+        rows = np.flatnonzero(self.alive & (dx < Bird.WIDTH) & (dx + Pipe.WIDTH > 0))   # pipe is level with the bird
+        if not FAST_COLLISION:
+            for i in rows:
+                hits[i] = Pipe(int(pipe_x[i]), int(pipe_height[i])).collide(self.bird(i))
+            return hits
+
+        bird_y = np.round(self.y[rows]).astype(np.int64)
+        for part, edge in (("pipe_top", pipe_height[rows] - Pipe.HEIGHT), ("pipe_bottom", pipe_height[rows] + Pipe.GAP)):
+            oy = edge - bird_y + PIPE_HEIGHT - 1
+            near = (oy >= 0) & (oy < PIPE_HEIGHT + BIRD_HEIGHT - 1)
+            sel = rows[near]
+            hits[sel] |= collision_grid(part)[self.img_index[sel], dx[sel] + PIPE_WIDTH - 1, oy[near]]
+        return hits
+
+    def take(self, rows):
+        """
+        a smaller batch holding only some of the birds
+        :param rows: indices of the birds to keep
+        :return: BirdBatch
+        """
+        batch = BirdBatch(0, self.x, 0)
+        for name in ("y", "tilt", "tick_count", "vel", "height", "img_count", "img_index", "alive"):
+            setattr(batch, name, getattr(self, name)[rows])
+        return batch
+
+    def bird(self, i):
+        """
+        a Bird object holding the current state of one slot, used for drawing
+        :param i: slot index
+        :return: Bird
+        """
+        bird = Bird(self.x, float(self.y[i]))
+        bird.tilt = int(self.tilt[i])
+        bird.tick_count = int(self.tick_count[i])
+        bird.vel = float(self.vel[i])
+        bird.height = float(self.height[i])
+        bird.img_count = int(self.img_count[i])
+        bird.img_index = int(self.img_index[i])
+        return bird
+
+    def alive_birds(self):
+        """
+        Bird objects for every live slot
+        :return: list of Bird
+        """
+        return [self.bird(i) for i in np.flatnonzero(self.alive)]
+
+
+class Pipe():
+    """
+    represents a pipe object
+    """
+    GAP = 200                 # space between pipes
+    VEL = 5                   # how fast pipes are moving
+    WIDTH = PIPE_WIDTH
+    HEIGHT = PIPE_HEIGHT
+
+    def __init__(self, x, height=None):
+        """
+        initialize pipe object
+        :param x: int
+        :param height: height of the gap, None picks a random one
+        :return" None
+        """
+        self.x = x
+        self.height = 0             # random height
+
+        # where the top and bottom of the pipe is
+        self.top = 0
+        self.bottom = 0
+
+        self.passed = False        # has the bird passed the pipe
+
+        self.set_height(height)    #
+
+    def reset(self, x, height=None):
+        """
+        reuse the pipe as a new one
+        :param x: int
+        :param height: height of the gap, None picks a random one
+        :return: None
+        """
+        self.x = x
+        self.passed = False
+        self.set_height(height)
+
+    def set_height(self, height=None):
+        """
+        set the height of the pipe, from the top of the screen
+        :param height: int, None picks a random one
+        :return: None
+        """
+        self.height = random.randrange(50, 450) if height is None else height
+        self.top = self.height - self.HEIGHT
+        self.bottom = self.height + self.GAP
+
+    def move(self):
+        """
+        move pipe based on vel
+        :return: None
+        """
+        self.x -= self.VEL       # change x wrt velocity
+
+    def draw(self, win):
+        """
+        draw both the top and bottom of the pipe
+        :param win: pygame window/surface
+        :return: None
+        """
+        from FlappyBird import draw_pipe
+        draw_pipe(win, self)
+
+    def collide(self, bird, win=None):
+        """
+        returns if a point is colliding with the pipe
+        :param bird: Bird object
+        :param win: unused, kept for callers written against the pygame version
+        :return: Bool
+        """
+        if self.x >= bird.x + Bird.WIDTH or self.x + self.WIDTH <= bird.x:   # not level with the bird
+            return False
+        bird_y = round(bird.y)
+        if bird_y >= self.height and bird_y + Bird.HEIGHT <= self.bottom:   # bird box is inside the gap
+            return False
+
+        masks = get_masks()
+        bird_mask = bird.get_mask()
+        top_offset = (self.x - bird.x, self.top - round(bird.y))        # how far away are masks from each other
+        bottom_offset = (self.x - bird.x, self.bottom - round(bird.y))
+
+        return mask_overlap(bird_mask, masks["pipe_bottom"], bottom_offset) or \
+            mask_overlap(bird_mask, masks["pipe_top"], top_offset)
+
+
+class PipePool:
+    """
+    The pipes on screen, oldest first, used like the list of pipes the game
+    loops keep. Pipes that leave the screen are kept and handed out again
+    by spawn(), so a long game creates only the few pipes that are ever on
+    screen together.
+    """
+
+    def __init__(self):
+        """
+        :return: None
+        """
+        self.pipes = []           # on screen, oldest first
+        self.free = []            # recycled, ready for reuse
+        self.created = 0          # Pipe objects made so far
+
+    def __len__(self):
+        return len(self.pipes)
+
+    def __iter__(self):
+        return iter(self.pipes)
+
+    def __getitem__(self, i):
+        return self.pipes[i]
+
+    def spawn(self, x, height=None):
+        """
+        put a pipe on screen, reusing a recycled one when there is one
+        :param x: int
+        :param height: height of the gap, None picks a random one
+        :return: Pipe
+        """
+        if self.free:
+            pipe = self.free.pop()
+            pipe.reset(x, height)
+        else:
+            pipe = Pipe(x, height)
+            self.created += 1
+        self.pipes.append(pipe)
+        return pipe
+
+    def recycle(self, pipe):
+        """
+        take a pipe off screen and keep it for reuse
+        :param pipe: Pipe on screen
+        :return: None
+        """
+        self.pipes.remove(pipe)
+        self.free.append(pipe)
+
+
+class Base:
+    """
+    Represnts the moving floor of the game
+    """
+    VEL = 5                                # same as pipe velocity
+    WIDTH = BASE_WIDTH                     # how wide
+
+    def __init__(self, y):
+        """
+        Initialize the object
+        :param y: int
+        :return: None
+        """
+        self.y = y
+        self.x1 = 0                     # one of the base images starts at 0
+        self.x2 = self.WIDTH            # the other base image starts after the 1st image
+
+    def move(self):
+        """
+        move floor so it looks like its scrolling
+        we use two images and move left
+        :return: None
+        """
+        self.x1 -= self.VEL                      # move the image wrt velocity
+        self.x2 -= self.VEL
+        if self.x1 + self.WIDTH < 0:             # if 1st image has completely gone outta screen, put it behind 2nd image
+            self.x1 = self.x2 + self.WIDTH
+
+        if self.x2 + self.WIDTH < 0:
+            self.x2 = self.x1 + self.WIDTH      # if 2nd image has completely gone outta screen, put it behind 1st image
+
+    def draw(self, win):
+        """
+        Draw the floor. This is two images that move together.
+        :param win: the pygame surface/window
+        :return: None
+        """
+        from FlappyBird import draw_base
+        draw_base(win, self)
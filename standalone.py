@@ -0,0 +1,154 @@
+"""
+Trained birds as standalone files that play without neat-python.
+
+export() compiles a genome (or a FeedForwardNetwork) into a small Python
+source file: one straight line `activate(inputs)` with the weights, biases
+and responses written in, nodes in evaluation order, plus `act(obs)`.
+load() runs that file with nothing but the math module, so a replay needs
+neither the NEAT config, neat-python nor NumPy, and a decision is a handful
+of float operations instead of a walk over dicts and lists. The outputs
+are the same floats FeedForwardNetwork.activate gives.
+
+    python standalone.py ai.pkl ai_net.py     # export, check and time it
+    python run.py ai_net.py                   # watch it play
+"""
+import os
+import sys
+import time
+
+VERSION = 1
+
+# activation name -> expression of z, the same arithmetic as neat.activations
+ACTIVATIONS = {
+    "sigmoid": "1.0 / (1.0 + exp(-max(-60.0, min(60.0, 5.0 * z))))",
+    "tanh": "tanh(max(-60.0, min(60.0, 2.5 * z)))",
+    "sin": "sin(max(-60.0, min(60.0, 5.0 * z)))",
+    "gauss": "exp(-5.0 * max(-3.4, min(3.4, z)) ** 2)",
+    "relu": "z if z > 0.0 else 0.0",
+    "softplus": "0.2 * log(1 + exp(max(-60.0, min(60.0, 5.0 * z))))",
+    "identity": "z",
+    "clamped": "max(-1.0, min(1.0, z))",
+    "abs": "abs(z)",
+    "hat": "max(0.0, 1 - abs(z))",
+    "square": "z ** 2",
+    "cube": "z ** 3",
+}
+AGGREGATIONS = ("sum", "max", "min")
+
+
+def compile_source(net):
+    """
+    the source of a standalone module computing the network
+    :param net: neat.nn.FeedForwardNetwork
+    :return: str
+    """
+    # values are named v0, v1, ... inputs first, then the nodes in evaluation order
+    names = dict((key, "v{0}".format(i)) for i, key in enumerate(net.input_nodes))
+    lines = ['"""standalone network written by standalone.py, format {0}"""'.format(VERSION),
+             "from math import exp, log, sin, tanh",
+             "",
+             "VERSION = {0}".format(VERSION),
+             "NUM_INPUTS = {0}".format(len(net.input_nodes)),
+             "",
+             "",
+             "def activate(inputs):"]
+    if net.input_nodes:
+        lines.append("    {0}{1} = inputs".format(", ".join(names[key] for key in net.input_nodes),
+                                                "," if len(net.input_nodes) == 1 else ""))
+    for node, act_func, agg_func, bias, response, links in net.node_evals:
+        act_name = act_func.__name__.replace("_activation", "")
+        agg_name = agg_func.__name__.replace("_aggregation", "")
+        if act_name not in ACTIVATIONS or agg_name not in AGGREGATIONS:
+            raise ValueError("node {0}: {1}/{2} can't be exported".format(node, act_name, agg_name))
+        # aggregate the same products in the same order as FeedForwardNetwork.activate
+        terms = "".join("{0} * {1!r}, ".format(names[i], float(w)) for i, w in links)
+        names[node] = "v{0}".format(len(names))
+        lines.append("    z = {0!r} + {1!r} * {2}(({3}))".format(float(bias), float(response), agg_name, terms))
+        lines.append("    {0} = {1}".format(names[node], ACTIVATIONS[act_name]))
+    # an output no node computes reads 0.0, like in neat-python
+    lines.append("    return [{0}]".format(", ".join(names.get(key, "0.0") for key in net.output_nodes)))
+    lines += ["", "", "def act(obs):", "    return activate(obs)[0] > 0.5", ""]
+    return "\n".join(lines)
+
+
+def export(player, path, config=None):
+    """
+    write a trained bird as a standalone network file
+    :param player: genome, or an already built FeedForwardNetwork
+    :param path: .py file to write
+    :param config: neat config, needed for a genome
+    :return: None
+    """
+    from evaluate import to_network
+    source = compile_source(to_network(player, config))
+    with open(path, "w") as f:
+        f.write(source)
+
+
+class StandaloneNetwork:
+    """
+    A network loaded from a file written by export(), with the
+    FeedForwardNetwork.activate interface and a jump decision.
+    """
+
+    def __init__(self, source, filename="<standalone network>"):
+        """
+        :param source: from compile_source()
+        :param filename: shown in tracebacks
+        :return: None
+        """
+        scope = {}
+        exec(compile(source, filename, "exec"), scope)
+        if scope.get("VERSION") != VERSION:
+            raise ValueError("{0} is network format {1}, this version reads {2}".format(
+                filename, scope.get("VERSION"), VERSION))
+        self.source = source
+        self.num_inputs = scope["NUM_INPUTS"]
+        self.activate = scope["activate"]
+        self.act = scope["act"]         # obs -> whether the bird jumps, the first output over 0.5 as in training
+
+
+def load(path):
+    """
+    :param path: .py file written by export()
+    :return: StandaloneNetwork
+    """
+    with open(path) as f:
+        return StandaloneNetwork(f.read(), path)
+
+
+if __name__ == '__main__':
+    # export a saved bird, then check and time the standalone file against neat-python
+    import random
+
+    start = time.perf_counter()           # what a replay of the pickle does before its first frame
+    import evaluate
+    import train
+    local_dir = os.path.dirname(os.path.abspath(__file__))
+    source = sys.argv[1] if len(sys.argv) > 1 else os.path.join(local_dir, 'ai.pkl')
+    config = train.load_config(os.path.join(local_dir, 'config-feedforward.txt'))
+    reference = evaluate.load_player(source, config)
+    create_seconds = time.perf_counter() - start
+
+    target = sys.argv[2] if len(sys.argv) > 2 else os.path.splitext(source)[0] + "_net.py"
+    export(reference, target)
+    start = time.perf_counter()
+    net = load(target)
+    load_seconds = time.perf_counter() - start
+
+    rng = random.Random(0)
+    inputs = [tuple(rng.uniform(-100, 800) for _ in range(net.num_inputs)) for _ in range(20000)]
+    mismatches = sum(net.activate(row) != reference.activate(row) for row in inputs)
+    timings = []
+    for activate in (reference.activate, net.activate):
+        start = time.perf_counter()
+        for row in inputs:
+            activate(row)
+        timings.append((time.perf_counter() - start) / len(inputs))
+    print("{0} -> {1}: {2} bytes, {3} mismatches in {4} inputs".format(
+        source, target, os.path.getsize(target), mismatches, len(inputs)))
+    print("start {0:.2f} ms -> {1:.2f} ms (imports, config, unpickle and create -> load)".format(
+        1e3 * create_seconds, 1e3 * load_seconds))
+    print("activate {0:.2f} us -> {1:.2f} us".format(1e6 * timings[0], 1e6 * timings[1]))
+    if mismatches:
+        raise SystemExit("{0} does not give the outputs of FeedForwardNetwork.activate".format(target))
@@ -0,0 +1,273 @@
+"""
+Hyperparameter sweeps over config-feedforward.txt.
+
+Every point of a grid (or of a random search) is trained headless on a
+few fixed course seeds, each (point, seed) trial in its own process. Each
+finished trial is appended to a JSON lines results file right away, and
+trials already in that file are skipped, so an interrupted sweep picks up
+where it stopped and re-running a sweep only runs the new points.
+
+    python sweep.py --param NEAT.pop_size=20,50,100 --param DefaultSpeciesSet.compatibility_threshold=2.0,3.0
+    python sweep.py --samples 20 --param DefaultGenome.weight_mutate_rate=0.5:1.0 --seeds 0 1 2 --workers 8
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import random
+import time
+from multiprocessing import Pool
+
+import neat
+
+import train
+from simulation import get_course
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(LOCAL_DIR, 'config-feedforward.txt')
+
+
+def parse_value(text):
+    """
+    :param text: value from the command line
+    :return: int, float or the text itself
+    """
+    for kind in (int, float):
+        try:
+            return kind(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_param(item):
+    """
+    :param item: "Section.key=v1,v2,..." for a list of values or "Section.key=low:high" for a range
+    :return: (name, list of values or (low, high) tuple)
+    """
+    name, sep, values = item.partition("=")
+    if not sep:
+        raise ValueError("--param expects Section.key=v1,v2 or Section.key=low:high, got {0!r}".format(item))
+    if ":" in values:
+        low, high = values.split(":", 1)
+        return name.strip(), (parse_value(low), parse_value(high))
+    return name.strip(), [parse_value(value) for value in values.split(",")]
+
+
+def grid(space):
+    """
+    every combination of the listed values
+    :param space: dict of "Section.key" -> list of values
+    :return: list of override dicts
+    """
+    for name, values in space.items():
+        if isinstance(values, tuple):
+            raise ValueError("{0} is a range, a grid needs a list of values (or use --samples)".format(name))
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_points(space, samples, seed=0):
+    """
+    random search: a random choice from every list, a uniform draw from every range
+    (whole numbers when both ends are ints)
+    :param space: dict of "Section.key" -> list of values or (low, high)
+    :param samples: number of points
+    :param seed: seed of the draws
+    :return: list of override dicts
+    """
+    rng = random.Random(seed)
+    points = []
+    for _ in range(samples):
+        point = {}
+        for name in sorted(space):
+            values = space[name]
+            if isinstance(values, tuple):
+                low, high = values
+                point[name] = rng.randint(low, high) if isinstance(low, int) and isinstance(high, int) \
+                    else rng.uniform(low, high)
+            else:
+                point[name] = rng.choice(values)
+        points.append(point)
+    return points
+
+
+def trial_key(config_text, overrides, seed, generations):
+    """
+    identifies a trial in the results file; changing the config file, a value,
+    the seed or the generations makes it a new trial
+    :return: str
+    """
+    blob = json.dumps([config_text, sorted(overrides.items()), seed, generations], sort_keys=True)
+    return hashlib.sha1(blob.encode()).hexdigest()[:16]
+
+
+def run_trial(config_file, overrides, seed, generations):
+    """
+    train one point on one course seed, headless and quietly
+    :param config_file: NEAT config file
+    :param overrides: dict of "Section.key" -> value
+    :param seed: seed for the course and for NEAT's random choices
+    :param generations: generation limit
+    :return: dict of results
+    """
+    train.RENDER = False
+    train.STOP_AT_THRESHOLD = True      # the game that reaches the threshold ends the run anyway
+    config = train.load_config(config_file, overrides)
+    course = get_course(seed)
+    random.seed(seed)
+    evaluated = []
+
+    def evaluate(genomes, config):
+        frames, bird_steps, reason = train.play(genomes, config, False, course)
+        evaluated.append(frames)
+
+    start = time.perf_counter()
+    p = neat.Population(config)
+    try:
+        best = p.run(evaluate, generations)
+        extinct = False
+    except neat.CompleteExtinctionException:
+        best = p.best_genome
+        extinct = True
+    seconds = time.perf_counter() - start
+
+    solved = best is not None and best.fitness >= config.fitness_threshold
+    return {"overrides": overrides, "seed": seed, "generations": generations,
+            "generations_run": len(evaluated),
+            "generations_to_threshold": len(evaluated) if solved else None,
+            "best_fitness": best.fitness if best is not None else None,
+            "frames": sum(evaluated), "seconds": seconds, "extinct": extinct}
+
+
+def _run_trial(job):
+    key, config_file, overrides, seed, generations = job
+    result = run_trial(config_file, overrides, seed, generations)
+    result["key"] = key
+    return result
+
+
+def load_results(path):
+    """
+    :param path: JSON lines results file
+    :return: dict of trial key -> result
+    """
+    results = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    result = json.loads(line)
+                    results[result["key"]] = result
+    return results
+
+
+def sweep(points, seeds, generations, workers, results_path, config_file=CONFIG_PATH, verbose=True):
+    """
+    run every (point, seed) trial not already in the results file
+    :param points: list of override dicts
+    :param seeds: course seeds every point is trained on
+    :param generations: generation limit of a trial
+    :param workers: processes
+    :param results_path: JSON lines file finished trials are appended to
+    :param config_file: NEAT config file the overrides are layered over
+    :return: list of the results of every trial of the sweep
+    """
+    with open(config_file) as f:
+        config_text = f.read()
+    done = load_results(results_path)
+    jobs = []
+    keys = []
+    for point in points:
+        for seed in seeds:
+            key = trial_key(config_text, point, seed, generations)
+            if key not in done and key not in keys:
+                jobs.append((key, config_file, point, seed, generations))
+            keys.append(key)
+
+    if verbose:
+        print("{0} trials, {1} cached, {2} to run".format(len(keys), len(keys) - len(jobs), len(jobs)))
+    if jobs:
+        with Pool(min(workers, len(jobs))) as pool, open(results_path, "a") as out:
+            for result in pool.imap_unordered(_run_trial, jobs):
+                out.write(json.dumps(result) + "\n")     # cached as soon as it is done
+                out.flush()
+                done[result["key"]] = result
+                if verbose:
+                    print("{0} seed {1}: {2} generations, best fitness {3:.1f}, {4:.1f}s".format(
+                        result["overrides"], result["seed"], result["generations_run"],
+                        result["best_fitness"] or 0.0, result["seconds"]))
+    return [done[key] for key in keys]
+
+
+def summarize(results):
+    """
+    one row per point: how often it reached the threshold, how fast, how well
+    :param results: list of trial results
+    :return: list of dicts, best points first
+    """
+    by_point = {}
+    for result in results:
+        by_point.setdefault(json.dumps(result["overrides"], sort_keys=True), []).append(result)
+    rows = []
+    for point, trials in by_point.items():
+        solved = [t["generations_to_threshold"] for t in trials if t["generations_to_threshold"] is not None]
+        row = dict(json.loads(point))
+        row.update({"trials": len(trials),
+                    "solved": len(solved),
+                    "mean_generations_to_threshold": sum(solved) / len(solved) if solved else None,
+                    "best_fitness": max(t["best_fitness"] or 0.0 for t in trials),
+                    "mean_seconds": sum(t["seconds"] for t in trials) / len(trials)})
+        rows.append(row)
+    rows.sort(key=lambda row: (-row["solved"], row["mean_generations_to_threshold"] or float("inf"),
+                               row["mean_seconds"]))
+    return rows
+
+
+def print_table(rows):
+    """
+    :param rows: from summarize()
+    :return: None
+    """
+    if not rows:
+        return
+    columns = list(rows[0].keys())
+    cells = [[("{0:.4g}".format(v) if isinstance(v, float) else str(v)) for v in (row[c] for c in columns)]
+             for row in rows]
+    widths = [max(len(c), *(len(r[i]) for r in cells)) for i, c in enumerate(columns)]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in cells:
+        print("  ".join(v.ljust(w) for v, w in zip(r, widths)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--param", action="append", default=[], required=True,
+                        metavar="SECTION.KEY=VALUES", help="v1,v2,... to try, or low:high for --samples (repeatable)")
+    parser.add_argument("--samples", type=int, help="random search with this many points instead of the full grid")
+    parser.add_argument("--sample-seed", type=int, default=0, help="seed of the random search")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0], help="course seeds every point is trained on")
+    parser.add_argument("--generations", type=int, default=train.GENERATIONS, help="generation limit of a trial")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="trials run at once")
+    parser.add_argument("--config", default=CONFIG_PATH, help="NEAT config file the values are layered over")
+    parser.add_argument("--results", default="sweep-results.jsonl", help="cache of finished trials")
+    parser.add_argument("--csv", help="also write the summary table to this file")
+    args = parser.parse_args(argv)
+
+    space = dict(parse_param(item) for item in args.param)
+    points = random_points(space, args.samples, args.sample_seed) if args.samples else grid(space)
+    results = sweep(points, args.seeds, args.generations, args.workers, args.results, args.config)
+    rows = summarize(results)
+    print_table(rows)
+    if args.csv and rows:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=list(rows[0].keys()))
+            writer.writeheader()
+            writer.writerows(rows)
+    return rows
+
+
+if __name__ == '__main__':
+    main()
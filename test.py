@@ -44,7 +44,8 @@ def main(genome, config):
 
     bird = Bird(230, 350)     # ADDING BIRD
     base = Base(FLOOR)        # ADDING BASE
-    pipes = [Pipe(700)]       # ADDING PIPES
+    pipes = PipePool()        # ADDING PIPES
+    pipes.spawn(700)
     #win = pygame.display.set_mode(WIN_WIDTH, WIN_HEIGHT)
 
 
@@ -63,7 +64,7 @@ def main(genome, config):
 
         ############  PIPE CHECK  ######################################
         pipe_ind = 0  # pipe index is set to zero, we are focusing on one pipe at a time
-        if len(pipes) > 1 and bird.x > pipes[0].x + pipes[0].PIPE_TOP.get_width():  # if we have passed the pipe, then use focus on second pipe
+        if len(pipes) > 1 and bird.x > pipes[0].x + Pipe.WIDTH:  # if we have passed the pipe, then use focus on second pipe
             pipe_ind = 1
 
         ################################################################
@@ -89,7 +90,7 @@ def main(genome, config):
                 pygame.quit()
                 quit()
                 break
-            if pipe.x + pipe.PIPE_TOP.get_width() < 0:  # if pipe is completely off screen
+            if pipe.x + Pipe.WIDTH < 0:  # if pipe is completely off screen
                 rem.append(pipe)                        # add pipe to remove list
 
             if not pipe.passed and pipe.x < bird.x:
@@ -97,13 +98,13 @@ def main(genome, config):
                 add_pipe = True
         if add_pipe:
             score += 1
-            pipes.append(Pipe(WIN_WIDTH))  # add new pipe to pipes list
+            pipes.spawn(WIN_WIDTH)  # add new pipe, reusing an old one
         for r in rem:               # once passed a pipe remove previous pipe from remove list
-            pipes.remove(r)
+            pipes.recycle(r)
         ################################################################
 
         ############  EXIT GAME WHEN BIRD HITS FLOOR  ##################
-        if bird.y + bird.img.get_height() - 10 >= FLOOR or bird.y < -50:  # bird hit the floor
+        if bird.hit_bounds():  # bird hit the floor
             pygame.quit()
             quit()
             break
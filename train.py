@@ -1,6 +1,220 @@
-from FlappyBird import *
+import os
+import time
+import argparse
+import configparser
+import hashlib
+import tempfile
 import neat
 import pickle
+import numpy as np
+from simulation import *
+from inference import BatchNetwork
+
+GENERATIONS = 50        # generations run() trains for
+MAX_SCORE = 80          # a game ends once its score goes past this
+BIRD_X, BIRD_Y = 230, 350   # where every bird starts
+RENDER = True           # watch training in a window; set to False on machines without a display
+FPS = 30                # frame cap while rendering; None steps the simulation as fast as the CPU allows
+RENDER_EVERY_FRAME = 1  # only draw every Nth frame
+RENDER_EVERY_GEN = 1    # only open the window for every Nth generation
+SEED = None             # seed for the pipe heights so every generation plays the same course; None is random
+COURSE_FILE = None      # optional .npy file the seeded course is memory mapped from (written on first use), the seed goes into its name: course.npy -> course-7.npy
+PROFILER = None         # a profiler.FrameProfiler (also added as a reporter) to time each phase of the frame loop
+WORKERS = 1             # processes evaluating the population, more than 1 trains headless (see parallel.py)
+MAX_FRAMES = None       # stop a generation's game after this many frames; None plays on
+MAX_SECONDS = None      # stop a generation's game after this much wall time; None plays on
+STOP_AT_THRESHOLD = False   # stop once a bird is sure to reach fitness_threshold (the run is over then anyway)
+CHECKPOINT_EVERY = 5    # generations between checkpoints (see checkpoint.py); None turns them off
+CHECKPOINT_PREFIX = "checkpoint-"   # checkpoint files, next to this script, are this plus a generation number
+SOLO_FAST_PATH = True   # play the last bird alive with the scalar objects, same result, much cheaper than the arrays
+DECISION_INTERVAL = 1   # networks decide every Nth frame, from the first; a jump then plays out until the next decision
+TRACE_DIR = None        # directory each generation's game is recorded to as a binary trace (see recording.py), with WORKERS = 1; None records nothing
+DECISION_CACHE = None   # cache the last bird's decisions (SOLO_FAST_PATH) by observations rounded to this step (see decision_cache.py), with WORKERS = 1; 0 exact observations, None no cache
+DECISION_CACHE_SIZE = 4096      # cached decisions kept
+DECISION_CACHE_VERIFY = False   # activate on cache hits anyway and count the wrong decisions, to weigh DECISION_CACHE
+FITNESS_CACHE = True    # with a seeded course, a genome identical to one of the last generation (an elite) gets its fitness without playing
+GAME_SETTINGS = ("MAX_SCORE", "MAX_FRAMES", "MAX_SECONDS", "STOP_AT_THRESHOLD", "SOLO_FAST_PATH",
+                 "DECISION_INTERVAL", "BIRD_X", "BIRD_Y")    # the settings above a headless play() reads
+gen = 0
+
+class Flock:
+    """
+    The birds of one game, one slot per genome. A slot keeps its index for
+    the whole game and dying only clears its alive bit, so removing a bird
+    is O(1) and never shifts the lists being looped over. Fitness is kept
+    in an array and written back to the genomes when the game ends.
+
+    Once half the birds are dead the bird and network arrays are compacted
+    to the survivors, so the per-frame cost follows the live count. The
+    rows of those arrays then differ from the slots; slot_ids maps one to
+    the other.
+    """
+    MIN_COMPACT = 16          # don't bother compacting arrays smaller than this
+
+    def __init__(self, genomes, config, x=BIRD_X, y=BIRD_Y):
+        """
+        :param genomes: list of (genome_id, genome)
+        :param config: neat config
+        :param x: starting x pos of every bird
+        :param y: starting y pos of every bird
+        :return: None
+        """
+        self.genomes = [genome for genome_id, genome in genomes]
+        self.nets = BatchNetwork.create(self.genomes, config)     # every network compiled to NumPy arrays
+        self.birds = BirdBatch(len(self.genomes), x, y)           # one row per bird; all start at same position
+        self.slot_ids = np.arange(len(self.genomes))              # row -> slot
+        self.fitness = np.zeros(len(self.genomes))                # per slot, start with fitness level of 0
+        self.alive_count = len(self.genomes)
+
+    def alive_rows(self):
+        """
+        :return: indices of the live rows of birds/nets
+        """
+        return np.flatnonzero(self.birds.alive)
+
+    def reward(self, amount):
+        """
+        add to the fitness of every live bird
+        :param amount: float
+        :return: None
+        """
+        self.fitness[self.slot_ids[self.birds.alive]] += amount
+
+    def kill(self, mask, penalty=0):
+        """
+        remove birds from the game
+        :param mask: bool array over rows, True for birds that died
+        :param penalty: subtracted from the fitness of those birds
+        :return: number of birds removed
+        """
+        mask = mask & self.birds.alive
+        if penalty:
+            self.fitness[self.slot_ids[mask]] -= penalty
+        killed = int(mask.sum())
+        self.birds.alive[mask] = False
+        self.alive_count -= killed
+        return killed
+
+    def compact(self):
+        """
+        drop dead rows once they are the majority
+        :return: True if the arrays were rebuilt
+        """
+        if len(self.birds) < self.MIN_COMPACT or self.alive_count > len(self.birds) // 2:
+            return False
+        rows = self.alive_rows()
+        self.birds = self.birds.take(rows)
+        self.nets = self.nets.take(rows)
+        self.slot_ids = self.slot_ids[rows]
+        return True
+
+    def finish(self):
+        """
+        write the fitness of every slot back to its genome
+        :return: None
+        """
+        for genome, fitness in zip(self.genomes, self.fitness.tolist()):
+            genome.fitness = fitness
+
+
+def game_settings():
+    """
+    the GAME_SETTINGS as they are set in this process, for apply_settings()
+    in a worker process: a spawned worker imports this module afresh and
+    would play with the defaults
+    :return: dict of name -> value
+    """
+    return dict((name, globals()[name]) for name in GAME_SETTINGS)
+
+
+def apply_settings(settings):
+    """
+    :param settings: from game_settings()
+    :return: None
+    """
+    globals().update((name, settings[name]) for name in GAME_SETTINGS)
+
+
+def genome_hash(genome):
+    """
+    a hash of everything in a genome that decides how its bird plays
+    :param genome: neat.DefaultGenome
+    :return: str
+    """
+    nodes = sorted((key, node.bias, node.response, node.activation, node.aggregation)
+                   for key, node in genome.nodes.items())
+    connections = sorted((key, conn.weight, conn.enabled) for key, conn in genome.connections.items())
+    return hashlib.sha1(repr((nodes, connections)).encode()).hexdigest()     # repr keeps every bit of the floats
+
+
+def game_key(seed, course_file):
+    """
+    the settings a bird's fitness depends on besides its genome, every one
+    the game loop branches on
+    :param seed: course seed
+    :param course_file: .npy file the course is memory mapped from, or None
+    :return: tuple
+    """
+    return (seed, course_file, MAX_SCORE, MAX_FRAMES, DECISION_INTERVAL, DECISION_CACHE, SOLO_FAST_PATH,
+            BIRD_X, BIRD_Y)
+
+
+def fitness_cacheable(config):
+    """
+    whether a bird's fitness on a seeded course depends on nothing but its
+    genome, so FitnessCache can hand it out: no wall time budget, no stop
+    that depends on the other birds and no rounding decision cache (it plays
+    whichever bird is left last differently)
+    :param config: neat config
+    :return: bool
+    """
+    return MAX_SECONDS is None and fitness_threshold(config) is None and not DECISION_CACHE
+
+
+class FitnessCache:
+    """
+    The fitness of every genome of the last generation evaluated, by game
+    settings and genome_hash. Elitism carries genomes into the next
+    generation unchanged, and on a seeded course they would play the same
+    game again; they get their fitness from here instead.
+    """
+
+    def __init__(self):
+        self.entries = {}         # (game_key, genome_hash) -> fitness
+        self.current = []         # (key, genome) of the generation being evaluated
+        self.hits = 0             # genomes of that generation found
+
+    def lookup(self, genomes, game):
+        """
+        set the fitness of the genomes already played
+        :param genomes: list of (genome_id, genome)
+        :param game: game_key() of the course they play
+        :return: list of (genome_id, genome) still to play
+        """
+        self.current = []
+        self.hits = 0
+        unplayed = []
+        for genome_id, genome in genomes:
+            key = (game, genome_hash(genome))
+            self.current.append((key, genome))
+            fitness = self.entries.get(key)
+            if fitness is None:
+                unplayed.append((genome_id, genome))
+            else:
+                genome.fitness = fitness
+                self.hits += 1
+        return unplayed
+
+    def update(self):
+        """
+        keep the fitness of this generation's genomes, once they are all set
+        :return: None
+        """
+        self.entries = dict((key, genome.fitness) for key, genome in self.current)
+
+
+fitness_cache = FitnessCache()
+
 
 def eval_genomes(genomes, config):
     """
@@ -8,96 +222,214 @@ def eval_genomes(genomes, config):
     birds and sets their fitness based on the distance they
     reach in the game.
     """
-    global WIN, gen
-    win = WIN
+    global gen
     gen += 1
 
-    # start by creating lists holding the genome itself, the
-    # neural network associated with the genome and the
-    # bird object that uses that network to play
-    nets = []
-    birds = []
-    ge = []
-    for genome_id, genome in genomes:
-        genome.fitness = 0                           # start with fitness level of 0
-        net = neat.nn.FeedForwardNetwork.create(genome, config)   # create feed forward NN
-        nets.append(net)
-        birds.append(Bird(230,350))                         # bird object; all start at same position
-        ge.append(genome)
+    render = RENDER and (gen - 1) % RENDER_EVERY_GEN == 0
+    start = time.perf_counter()
+    course = get_course(SEED, COURSE_FILE) if SEED is not None else None
+    cached = FITNESS_CACHE and course is not None and not render and fitness_cacheable(config)    # watching shows every bird
+    unplayed = fitness_cache.lookup(genomes, game_key(SEED, COURSE_FILE)) if cached else genomes
+    recorder = None
+    if TRACE_DIR:
+        from recording import TraceRecorder
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        recorder = TraceRecorder(os.path.join(TRACE_DIR, "gen-{0:04d}.trace".format(gen)), len(unplayed), gen, BIRD_X)
+    cache_stats = None
+    if DECISION_CACHE is not None and SOLO_FAST_PATH and not render:      # only the solo fast path caches
+        from decision_cache import CacheStats
+        cache_stats = CacheStats()
+    try:
+        if unplayed:
+            frames, bird_steps, reason = play(unplayed, config, render, course, PROFILER, recorder, cache_stats)
+        else:
+            frames, bird_steps, reason = 0, 0, "cached"
+            if PROFILER:
+                PROFILER.start_game()        # report no frames, not the last game's
+    finally:
+        if recorder:
+            recorder.close()
+    if cached:
+        fitness_cache.update()
+    elapsed = time.perf_counter() - start
+    print("Simulated {0} frames in {1:.2f}s ({2:.0f} frames/sec, {3:.0f} bird-steps/sec), stopped: {4}".format(
+        frames, elapsed, frames / max(elapsed, 1e-9), bird_steps / max(elapsed, 1e-9), reason))
+    if cached:
+        print("Fitness cache: {0} of {1} genomes unchanged, not played".format(fitness_cache.hits, len(genomes)))
+    if cache_stats:
+        print("Decision cache: {0}".format(cache_stats))
+
+
+def fitness_threshold(config):
+    """
+    the fitness that ends the run, when STOP_AT_THRESHOLD may cut games short for it
+    :param config: neat config
+    :return: float or None
+    """
+    if not STOP_AT_THRESHOLD or config.fitness_criterion != "max" or config.no_fitness_termination:
+        return None
+    return config.fitness_threshold
+
+
+def stop_reason(frames, score, deadline, best, threshold):
+    """
+    why the game should end after this frame
+    :param frames: frames played
+    :param score: pipes passed
+    :param deadline: perf_counter time to stop at, or None
+    :param best: highest fitness so far (only read with a threshold)
+    :param threshold: fitness that ends the run, or None
+    :return: "score", "frames", "time", "threshold" or None to play on
+    """
+    if score > MAX_SCORE:
+        return "score"
+    if MAX_FRAMES is not None and frames >= MAX_FRAMES:
+        return "frames"
+    if deadline is not None and time.perf_counter() >= deadline:
+        return "time"
+    if threshold is not None and best - 1 >= threshold:    # still there even if the bird hits a pipe (-1)
+        return "threshold"
+    return None
+
+
+def play(genomes, config, render=False, course=None, profiler=None, recorder=None, cache_stats=None):
+    """
+    plays one game with every genome controlling a bird
+    and sets each genome's fitness
+    :param genomes: list of (genome_id, genome)
+    :param config: neat config
+    :param render: draw the game in a window
+    :param course: Course the pipe heights come from, None for random pipes
+    :param profiler: optional FrameProfiler timing each phase of the frame
+    :param recorder: optional recording.TraceRecorder every frame is written to
+    :param cache_stats: a decision_cache.CacheStats, the solo fast path then caches the last
+                        bird's decisions (DECISION_CACHE) and counts into it; None for no cache
+    :return: (frames simulated, bird steps i.e. live birds summed over frames,
+              why the game ended: "extinct" or a stop_reason)
+    """
+    if render:
+        import pygame
+        import FlappyBird          # only opens the window and loads sprites when we want to watch
+
+    flock = Flock(genomes, config, BIRD_X, BIRD_Y)
+    birds = flock.birds
 
     base = Base(FLOOR)
-    pipes = [Pipe(700)]
+    pipe_count = 0            # pipes created so far, indexes the course
+    pipes = PipePool()        # off screen pipes are reused for new ones
+    pipes.spawn(700, course.height(pipe_count) if course else None)
     score = 0
 
-    clock = pygame.time.Clock()
+    if render:
+        clock = pygame.time.Clock()
+        renderer = FlappyBird.Renderer(FlappyBird.WIN)     # redraws only what moved each frame
+
+    if profiler:
+        profiler.start_game()
+
+    deadline = time.perf_counter() + MAX_SECONDS if MAX_SECONDS is not None else None
+    threshold = fitness_threshold(config)
+    reason = "extinct"
 
+    frames = 0
+    bird_steps = 0
     run = True
-    while run and len(birds) > 0:
-        clock.tick(30)
+    while run and flock.alive_count > 0:
+        frames += 1
+        if profiler:
+            profiler.start_frame()
+        if render and frames % RENDER_EVERY_FRAME == 0:
+            if FPS:
+                clock.tick(FPS)
 
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
-                run = False
-                pygame.quit()
-                quit()
-                break
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    run = False
+                    pygame.quit()
+                    quit()
+                    break
 
         pipe_ind = 0  # pipe index is set to zero, we are focusing on one pipe at a time
-        if len(birds) > 0:
-            # determine whether to use the first or second pipe on the screen for neural network input
-            if len(pipes) > 1 and birds[0].x > pipes[0].x + pipes[0].PIPE_TOP.get_width():  # if we have passed the pipe, then use focus on second pipe
-                pipe_ind = 1
+        # determine whether to use the first or second pipe on the screen for neural network input
+        if len(pipes) > 1 and birds.x > pipes[0].x + Pipe.WIDTH:  # if we have passed the pipe, then use focus on second pipe
+            pipe_ind = 1
 
-        for x, bird in enumerate(birds):  # give each bird a fitness of 0.1 for each frame it stays alive
-            ge[x].fitness += 0.1  # every second bird is alive get 0.1
-            bird.move()
+        birds.move()              # one vectorized step for every live bird
+        bird_steps += flock.alive_count
+        if profiler:
+            profiler.lap("move")
 
-            # send bird location, top pipe location and bottom pipe location and determine from network whether to jump or not
-            output = nets[birds.index(bird)].activate((bird.y, abs(bird.y - pipes[pipe_ind].height), abs(bird.y - pipes[pipe_ind].bottom)))
+        flock.reward(0.1)         # give each bird a fitness of 0.1 for each frame it stays alive
 
-            if output[0] > 0.5:  # we use a tanh activation function so result will be between -1 and 1. if over 0.5 jump
-                bird.jump()
+        if (frames - 1) % DECISION_INTERVAL == 0:
+            alive = flock.alive_rows()
+            # send bird location, top pipe location and bottom pipe location and determine from network whether to jump or not
+            y = birds.y[alive]
+            inputs = np.column_stack((y, np.abs(y - pipes[pipe_ind].height), np.abs(y - pipes[pipe_ind].bottom)))
+            jumps = np.zeros(len(birds), bool)
+            jumps[alive] = flock.nets.decide(inputs, alive)  # all live networks evaluated at once
+            birds.jump(jumps)
+        if profiler:
+            profiler.lap("activate")
 
         base.move()
 
         rem = []
         add_pipe = False
+        collisions = 0
         for pipe in pipes:
             pipe.move()               # will produce random pipes moving towards bird
-            # check for collision
-            for bird in birds:
-                if pipe.collide(bird, win):
-                    ge[birds.index(bird)].fitness -= 1   # every time any bird hits pipe subtract 1 from fitness score
-                    nets.pop(birds.index(bird))    # NN associated with collided bird removed
-                    ge.pop(birds.index(bird))
-                    birds.pop(birds.index(bird))   # removes that bird object which collided
-
-            if pipe.x + pipe.PIPE_TOP.get_width() < 0:  # if pipe is completely off screen
+            if profiler:
+                profiler.lap("pipes")
+            # check for collision; every time any bird hits pipe subtract 1 from fitness score and it is out
+            collisions += flock.kill(birds.collide(pipe), penalty=1)
+            if profiler:
+                profiler.lap("collide")
+
+            if pipe.x + Pipe.WIDTH < 0:  # if pipe is completely off screen
                 rem.append(pipe)                        # add pipe to remove list
 
-            if not pipe.passed and pipe.x < bird.x:
+            if not pipe.passed and pipe.x < birds.x:
                 pipe.passed = True
                 add_pipe = True
 
         if add_pipe:
             score += 1               # we have passed a pipe increase score
             # can add this line to give more reward for passing through a pipe (not required)
-            for genome in ge:
-                genome.fitness += 5  # every bird that passes pipes; we add 5 to Fitness score
-            pipes.append(Pipe(WIN_WIDTH))   # add new pipe to pipes list
+            flock.reward(5)          # every bird that passes pipes; we add 5 to Fitness score
+            pipe_count += 1
+            pipes.spawn(WIN_WIDTH, course.height(pipe_count) if course else None)   # add new pipe, reusing an old one
 
         for r in rem:               # once passed a pipe remove previous pipe from remove list
-            pipes.remove(r)
+            pipes.recycle(r)
+        if profiler:
+            profiler.lap("pipes")
 
-        for bird in birds:         # check if any of the birds in generation has hit the ground
-            if bird.y + bird.img.get_height() - 10 >= FLOOR or bird.y < -50:  # bird hit the floor
-                nets.pop(birds.index(bird))   # NN associated with collided bird removed
-                ge.pop(birds.index(bird))
-                birds.pop(birds.index(bird))  # removes that bird object which collided
+        flock.kill(birds.hit_bounds())  # check if any of the birds in generation has hit the ground
+        if flock.compact():
+            birds = flock.birds
 
-        draw_window(WIN, birds, pipes, base, score, gen, pipe_ind)
+        if render and frames % RENDER_EVERY_FRAME == 0:
+            if profiler:
+                profiler.lap("other")
+            renderer.draw(birds.alive_birds(), pipes, base, score, gen, pipe_ind)
+            if profiler:
+                profiler.lap("draw")
+        if recorder:
+            recorder.record(birds, flock.slot_ids, pipes, base, score, pipe_ind)
+        if profiler:
+            profiler.end_frame(flock.alive_count, collisions, len(pipes))
         
-        if score > 80:
+        stop = stop_reason(frames, score, deadline, flock.fitness.max() if threshold is not None else None, threshold)
+        if stop:
+            reason = stop
+            break
+
+        if SOLO_FAST_PATH and flock.alive_count == 1 and not render:
+            solo_start = frames
+            frames, score, reason = play_solo(flock, config, pipes, base, score, pipe_count, course,
+                                              frames, deadline, threshold, profiler, recorder, cache_stats)
+            bird_steps += frames - solo_start
             break
 
         """
@@ -108,32 +440,245 @@ def eval_genomes(genomes, config):
             break
         """
 
+    flock.finish()
+    return frames, bird_steps, reason
+
+
+def play_solo(flock, config, pipes, base, score, pipe_count, course, frames, deadline, threshold, profiler=None,
+              recorder=None, cache_stats=None):
+    """
+    finish the game of play() for the one bird left, with a Bird, Pipe.collide
+    and FeedForwardNetwork.activate; for a single bird these are many times
+    cheaper than the array code and step it the same way
+    :param flock: Flock with one live bird
+    :param config: neat config
+    :param pipes: PipePool of the game
+    :param base: Base object
+    :param score: score so far
+    :param pipe_count: pipes created so far
+    :param course: Course the pipe heights come from, None for random pipes
+    :param frames: frames played so far
+    :param deadline: perf_counter time to stop at, or None
+    :param threshold: fitness that ends the run, or None
+    :param profiler: optional FrameProfiler
+    :param recorder: optional recording.TraceRecorder
+    :param cache_stats: optional decision_cache.CacheStats, caches the bird's decisions (DECISION_CACHE)
+    :return: (frames played, score, why the game ended)
+    """
+    row = flock.alive_rows()[0]
+    slot = flock.slot_ids[row]
+    net = neat.nn.FeedForwardNetwork.create(flock.genomes[slot], config)
+    if cache_stats is not None:
+        from decision_cache import CachedNetwork
+        net = CachedNetwork(net, DECISION_CACHE, DECISION_CACHE_SIZE, DECISION_CACHE_VERIFY, cache_stats)
+    others = np.delete(flock.fitness, slot)
+    best_other = float(others.max()) if len(others) else -np.inf     # the dead birds' fitness is final
+
+    frames, score, fitness, alive, reason = play_bird(
+        net, flock.birds.bird(row), pipes, base, score, pipe_count, course, frames, float(flock.fitness[slot]),
+        deadline, threshold, best_other, profiler, recorder, slot)
+    flock.fitness[slot] = fitness
+    if not alive:
+        flock.kill(flock.birds.alive)
+    return frames, score, reason
+
+
+def play_one(net, course=None, max_frames=None, recorder=None):
+    """
+    a whole headless game of one bird, by the rules of training
+    :param net: anything with activate(inputs), e.g. FeedForwardNetwork or StandaloneNetwork
+    :param course: Course the pipe heights come from, None for random pipes
+    :param max_frames: stop after this many frames, besides MAX_FRAMES
+    :param recorder: optional recording.TraceRecorder, the bird is slot 0
+    :return: (frames played, score, fitness, why the game ended)
+    """
+    pipes = PipePool()
+    pipes.spawn(700, course.height(0) if course else None)
+    frames, score, fitness, alive, reason = play_bird(net, Bird(BIRD_X, BIRD_Y), pipes, Base(FLOOR), course=course,
+                                                      recorder=recorder, max_frames=max_frames)
+    return frames, score, fitness, reason
+
+
+def play_bird(net, bird, pipes, base, score=0, pipe_count=0, course=None, frames=0, fitness=0.0, deadline=None,
+              threshold=None, best_other=-np.inf, profiler=None, recorder=None, slot=0, max_frames=None):
+    """
+    play one bird with the scalar game objects until it dies or a
+    stop_reason ends the game, frame by frame as play() steps its birds;
+    the game loop of play_solo and play_one
+    :param net: anything with activate(inputs)
+    :param bird: Bird object
+    :param pipes: PipePool of the game
+    :param base: Base object
+    :param score: score so far
+    :param pipe_count: pipes created so far
+    :param course: Course the pipe heights come from, None for random pipes
+    :param frames: frames played so far
+    :param fitness: the bird's fitness so far
+    :param deadline: perf_counter time to stop at, or None
+    :param threshold: fitness that ends the run, or None
+    :param best_other: highest fitness of the other birds of the game, for threshold
+    :param profiler: optional FrameProfiler
+    :param recorder: optional recording.TraceRecorder
+    :param slot: the bird's slot in the recording
+    :param max_frames: stop after this many frames, besides MAX_FRAMES
+    :return: (frames played, score, fitness, whether the bird is still alive, why the game ended)
+    """
+    alive = True
+    reason = "extinct"
+    while alive:
+        frames += 1
+        if profiler:
+            profiler.start_frame()
+
+        pipe_ind = 0
+        if len(pipes) > 1 and bird.x > pipes[0].x + Pipe.WIDTH:
+            pipe_ind = 1
+
+        bird.move()
+        if profiler:
+            profiler.lap("move")
+        fitness += 0.1
+
+        if (frames - 1) % DECISION_INTERVAL == 0:
+            output = net.activate((bird.y, abs(bird.y - pipes[pipe_ind].height), abs(bird.y - pipes[pipe_ind].bottom)))
+            if output[0] > 0.5:
+                bird.jump()
+        if profiler:
+            profiler.lap("activate")
+
+        base.move()
+
+        rem = []
+        add_pipe = False
+        collisions = 0
+        for pipe in pipes:
+            pipe.move()
+            if profiler:
+                profiler.lap("pipes")
+            if alive and pipe.collide(bird):
+                fitness -= 1
+                alive = False
+                collisions = 1
+            if profiler:
+                profiler.lap("collide")
+
+            if pipe.x + Pipe.WIDTH < 0:
+                rem.append(pipe)
+
+            if not pipe.passed and pipe.x < bird.x:
+                pipe.passed = True
+                add_pipe = True
+
+        if add_pipe:
+            score += 1
+            if alive:
+                fitness += 5
+            pipe_count += 1
+            pipes.spawn(WIN_WIDTH, course.height(pipe_count) if course else None)
+
+        for r in rem:
+            pipes.recycle(r)
+        if profiler:
+            profiler.lap("pipes")
+
+        if alive and bird.hit_bounds():
+            alive = False
+        if profiler:
+            profiler.end_frame(int(alive), collisions, len(pipes))
+        if recorder:
+            recorder.record_one(slot, bird, alive, pipes, base, score, pipe_ind)
+
+        stop = stop_reason(frames, score, deadline, max(best_other, fitness), threshold)
+        if not stop and max_frames is not None and frames >= max_frames:
+            stop = "frames"
+        if stop:
+            reason = stop
+            break
+
+    return frames, score, fitness, alive, reason
+
+
+def load_config(config_file, overrides=None):
+    """
+    read the NEAT config, with some values replaced
+    :param config_file: location of config file
+    :param overrides: dict of "Section.key" -> value layered over the file
+    :return: neat config
+    """
+    if not overrides:
+        return neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
+                                  neat.DefaultSpeciesSet, neat.DefaultStagnation, config_file)
+    parser = configparser.ConfigParser()
+    parser.read(config_file)
+    for name, value in overrides.items():
+        section, _, key = name.partition(".")
+        if not parser.has_section(section) or not key:
+            raise ValueError("config override {0!r} should be Section.key with a section of {1}".format(
+                name, config_file))
+        parser.set(section, key, str(value))
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:   # neat only reads files
+        parser.write(f)
+    try:
+        return load_config(f.name)
+    finally:
+        os.remove(f.name)
+
 
-def run(config_file):
+def run(config_file, resume=None, overrides=None, winner_path=None):
     """
     runs the NEAT algorithm to train a neural network to play flappy bird.
     :param config_file: location of config file
+    :param resume: checkpoint file to continue a run from
+    :param overrides: dict of "Section.key" -> value replacing what config_file says
+    :param winner_path: where the best genome is pickled, ai.pkl next to this script by default
     :return: None
     """
+    global gen, SEED, COURSE_FILE, fitness_cache
     local_dir = os.path.dirname(__file__)
-    config = neat.config.Config(neat.DefaultGenome, neat.DefaultReproduction,
-                         neat.DefaultSpeciesSet, neat.DefaultStagnation, config_file)
+    config = load_config(config_file, overrides)
+    fitness_cache = FitnessCache()
 
-    # Create the population, which is the top-level object for a NEAT run.
-    p = neat.Population(config)
+    if resume:
+        import checkpoint
+        p, saved = checkpoint.restore(resume, config)   # population, species and random state as they were
+        stats = saved["stats"] or neat.StatisticsReporter()
+        gen, SEED, COURSE_FILE = saved["extra"]["gen"], saved["extra"]["seed"], saved["extra"]["course_file"]
+        print("Resuming from {0} at generation {1}".format(resume, p.generation))
+    else:
+        # Create the population, which is the top-level object for a NEAT run.
+        p = neat.Population(config)
+        stats = neat.StatisticsReporter()
 
     # Add a stdout reporter to show progress in the terminal.
     p.add_reporter(neat.StdOutReporter(True))
-    stats = neat.StatisticsReporter()
     p.add_reporter(stats)
-    #p.add_reporter(neat.Checkpointer(5))
+    checkpointer = None
+    if CHECKPOINT_EVERY:
+        from checkpoint import Checkpointer
+        checkpointer = Checkpointer(p.reproduction, CHECKPOINT_EVERY, os.path.join(local_dir, CHECKPOINT_PREFIX),
+                                    stats, lambda: {"gen": gen, "seed": SEED, "course_file": COURSE_FILE})
+        checkpointer.best_genome = p.best_genome
+        p.add_reporter(checkpointer)
+    if PROFILER is not None:
+        p.add_reporter(PROFILER)               # reports the phase breakdown after each generation
+    if DECISION_CACHE is not None and (WORKERS > 1 or not SOLO_FAST_PATH or (RENDER and RENDER_EVERY_GEN == 1)):
+        print("DECISION_CACHE is not used: it caches the last bird alive of a game played headless in this process "
+              "(WORKERS = 1, SOLO_FAST_PATH, RENDER off or RENDER_EVERY_GEN > 1)")
 
-    # Run for up to 50 generations.
+    # Run for up to GENERATIONS generations.
     #winner = p.run(eval_genomes, 50)
-    config.Winner = p.run(eval_genomes, 50)
+    generations = GENERATIONS - p.generation   # the rest of them when resuming
+    if WORKERS > 1:
+        from parallel import ParallelEvaluator     # headless, one shard of the population per process
+        with ParallelEvaluator(WORKERS, seed=SEED if SEED is not None else 0, course_file=COURSE_FILE) as pe:
+            config.Winner = p.run(pe.evaluate, generations)
+    else:
+        config.Winner = p.run(eval_genomes, generations)
+    if checkpointer:
+        checkpointer.wait()
     
     ##############################################################################################
-    with open(os.path.join(local_dir, 'ai.pkl'), "wb") as f:
+    with open(winner_path or os.path.join(local_dir, 'ai.pkl'), "wb") as f:
         pickle.dump(config.Winner, f)
         f.close()
     # show final stats
@@ -145,4 +690,7 @@ if __name__ == '__main__':
     # current working directory.
     local_dir = os.path.dirname(__file__)
     config_path = os.path.join(local_dir, 'config-feedforward.txt')
-    run(config_path)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train a NEAT population to play flappy bird")
+    parser.add_argument("--resume", help="checkpoint file to continue training from")
+    args = parser.parse_args()
+    run(config_path, args.resume)
\ No newline at end of file
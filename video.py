@@ -0,0 +1,251 @@
+"""
+Export a bird's run as a GIF or a PNG sequence, without a window and
+faster than real time.
+
+The run is played headless first, on a seeded course with the rules of
+training, and recorded to a trace (see recording.py). The frames are then
+drawn offscreen with Bird.draw, Pipe.draw and Base.draw by a pool of
+processes, each memory mapping the trace and rendering a chunk of frames.
+PNG frames are written by the workers. For a GIF the workers also reduce
+their frames to one shared palette and encode them with Pillow, and the
+encoded frames are joined under a single header.
+
+    python video.py ai.pkl --seed 0 --frames 5000 --output run.gif --scale 0.5
+    python video.py bestbird.pickle --output frames/          # frames/frame-00000.png, ...
+    python video.py traces/gen-0007.trace --output gen7.gif    # a recorded training game
+
+A trace from train.py's TRACE_DIR can be exported the same way.
+"""
+import argparse
+import os
+import struct
+import tempfile
+import time
+from multiprocessing import Pool
+
+from simulation import *
+from recording import TraceRecorder, TraceReader
+
+LOCAL_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_PATH = os.path.join(LOCAL_DIR, 'config-feedforward.txt')
+FPS = 30                  # frame rate the game runs at, and of the exported GIF
+CHUNK_FRAMES = 100        # frames a worker renders per task
+PALETTE_SAMPLES = 16      # frames the shared GIF palette is built from
+
+
+def play_run(net, seed, max_frames, path):
+    """
+    play one bird on a seeded course, headless and by the rules of training
+    (train.play_one), and record it to a trace
+    :param net: anything with activate(inputs), e.g. FeedForwardNetwork
+    :param seed: course seed
+    :param max_frames: stop after this many frames, if the bird is still alive
+    :param path: trace file to write
+    :return: (frames, score)
+    """
+    import train
+    with TraceRecorder(path, 1, 0, train.BIRD_X) as recorder:
+        frames, score, fitness, reason = train.play_one(net, get_course(seed), max_frames, recorder)
+    return frames, score
+
+
+def _init_worker():
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")      # offscreen: no window is opened
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.environ["SDL_NO_SIGNAL_HANDLERS"] = "1"               # let Pool stop the worker with SIGTERM
+
+
+def draw_frame(surface, reader, i):
+    """
+    draw one frame of a trace the way run.py draws the game
+    :param surface: pygame surface of the window's size
+    :param reader: TraceReader
+    :param i: frame index
+    :return: None
+    """
+    import FlappyBird
+    birds, pipes, base, score, pipe_ind = reader.state(i)
+    surface.blit(FlappyBird.bg_img, (0, 0))
+    for pipe in pipes:
+        pipe.draw(surface)
+    base.draw(surface)
+    for bird in birds:
+        bird.draw(surface)
+    score_label = FlappyBird.STAT_FONT.render("Score: " + str(score), 1, (255, 255, 255))
+    surface.blit(score_label, (WIN_WIDTH - score_label.get_width() - 15, 10))
+
+
+def render_frames(trace_path, frames, size):
+    """
+    draw some frames of a trace offscreen
+    :param trace_path: trace file
+    :param frames: frame indices
+    :param size: (width, height) of the output
+    :return: generator of (frame index, pygame surface)
+    """
+    import pygame
+    reader = TraceReader(trace_path)
+    surface = pygame.Surface((WIN_WIDTH, WIN_HEIGHT))
+    scaled = pygame.Surface(size) if size != (WIN_WIDTH, WIN_HEIGHT) else None
+    for i in frames:
+        draw_frame(surface, reader, i)
+        if scaled is not None:
+            pygame.transform.smoothscale(surface, size, scaled)
+        yield i, scaled or surface
+
+
+def _render_png(job):
+    import pygame
+    trace_path, frames, size, directory = job
+    for i, surface in render_frames(trace_path, frames, size):
+        pygame.image.save(surface, os.path.join(directory, "frame-{0:05d}.png".format(i)))
+    return len(frames)
+
+
+def _to_image(surface):
+    import pygame
+    from PIL import Image
+    return Image.frombytes("RGB", surface.get_size(), pygame.image.tobytes(surface, "RGB"))
+
+
+def _sample_palette(job):
+    """
+    a 256 color palette fitting a few frames spread over the run
+    :return: palette as a list of 768 ints
+    """
+    from PIL import Image
+    trace_path, frames, size = job
+    images = [_to_image(surface) for i, surface in render_frames(trace_path, frames, size)]
+    strip = Image.new("RGB", (size[0], size[1] * len(images)))
+    for k, image in enumerate(images):
+        strip.paste(image, (0, size[1] * k))
+    palette = strip.quantize(256, method=Image.Quantize.MEDIANCUT).getpalette()[:768]
+    return palette + [0] * (768 - len(palette))
+
+
+def gif_frames(data):
+    """
+    the frames of a GIF file without its header, palette, loop setting and
+    trailer, so GIFs with the same size and palette can be joined
+    :param data: GIF file contents
+    :return: bytes
+    """
+    flags = data[10]
+    pos = 13 + (3 << ((flags & 7) + 1) if flags & 0x80 else 0)     # header, screen descriptor, global colors
+    frames = []
+    while data[pos] != 0x3B:                   # trailer
+        block = pos
+        if data[pos] == 0x21:                  # extension: label, then sub-blocks
+            label = data[pos + 1]
+            pos += 2
+        else:                                  # image: descriptor, local colors, LZW code size, sub-blocks
+            local = data[pos + 9]
+            pos += 10 + (3 << ((local & 7) + 1) if local & 0x80 else 0) + 1
+            label = None
+        while data[pos]:
+            pos += data[pos] + 1
+        pos += 1
+        if label == 0xFF:                      # application extension (the loop setting)
+            continue
+        frames.append(data[block:pos])
+    return b"".join(frames)
+
+
+def _render_gif(job):
+    """
+    :return: the chunk's frames encoded as GIF frame blocks, see gif_frames
+    """
+    import io
+    from PIL import Image
+    trace_path, frames, size, palette, duration = job
+    reference = Image.new("P", (1, 1))
+    reference.putpalette(palette)
+    images = [_to_image(surface).quantize(palette=reference, dither=Image.Dither.NONE)
+              for i, surface in render_frames(trace_path, frames, size)]
+    out = io.BytesIO()
+    images[0].save(out, "GIF", save_all=True, append_images=images[1:], duration=duration, optimize=False)
+    return gif_frames(out.getvalue())
+
+
+def export(trace_path, output, scale=1.0, every=1, workers=1, verbose=True):
+    """
+    render a trace to a GIF (output ending in .gif) or to PNG files in the directory output
+    :param trace_path: trace file
+    :param output: .gif file or directory
+    :param scale: size of the frames relative to the window
+    :param every: only keep every Nth frame
+    :param workers: processes rendering
+    :return: number of frames written
+    """
+    frames = list(range(0, len(TraceReader(trace_path)), every))
+    size = (int(round(WIN_WIDTH * scale)), int(round(WIN_HEIGHT * scale)))
+    chunks = [frames[i:i + CHUNK_FRAMES] for i in range(0, len(frames), CHUNK_FRAMES)]
+    gif = output.lower().endswith(".gif")
+    if gif:
+        try:
+            from PIL import Image
+        except ImportError:
+            raise ImportError("GIF export needs Pillow (pip install pillow); a directory output writes PNG frames without it")
+    else:
+        os.makedirs(output, exist_ok=True)
+
+    start = time.perf_counter()
+    with Pool(max(1, min(workers, len(chunks))), _init_worker) as pool:
+        if gif:
+            samples = frames[::max(1, len(frames) // PALETTE_SAMPLES)][:PALETTE_SAMPLES]
+            palette = pool.apply(_sample_palette, ((trace_path, samples, size),))
+            duration = int(round(1000.0 * every / FPS))
+            with open(output, "wb") as f:
+                # one header and palette, looping, then the frames every worker encoded
+                f.write(b"GIF89a" + struct.pack("<HHBBB", size[0], size[1], 0xF7, 0, 0) + bytes(palette))
+                f.write(b"\x21\xFF\x0BNETSCAPE2.0\x03\x01\x00\x00\x00")
+                for part in pool.imap(_render_gif, [(trace_path, c, size, palette, duration) for c in chunks]):
+                    f.write(part)
+                f.write(b";")
+        else:
+            sum(pool.imap_unordered(_render_png, [(trace_path, c, size, output) for c in chunks]))
+    if verbose:
+        elapsed = time.perf_counter() - start
+        print("Exported {0} frames to {1} in {2:.1f}s ({3:.0f} frames/sec, {4:.1f}x real time)".format(
+            len(frames), output, elapsed, len(frames) / max(elapsed, 1e-9),
+            len(frames) * every / FPS / max(elapsed, 1e-9)))
+    return len(frames)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("path", nargs="?", default=os.path.join(LOCAL_DIR, "ai.pkl"),
+                        help="pickled genome or network, a standalone.py export, or a .trace file")
+    parser.add_argument("--output", default="run.gif", help=".gif file, or a directory for PNG frames")
+    parser.add_argument("--config", default=CONFIG_PATH, help="NEAT config file genomes were trained with")
+    parser.add_argument("--seed", type=int, default=0, help="course seed")
+    parser.add_argument("--frames", type=int, default=1000, help="longest run to play")
+    parser.add_argument("--decision-interval", type=int, default=1,
+                        help="the bird decides every this many frames, as train.py's DECISION_INTERVAL")
+    parser.add_argument("--scale", type=float, default=0.5, help="size of the frames relative to the window")
+    parser.add_argument("--every", type=int, default=1, help="only keep every Nth frame")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="processes rendering")
+    args = parser.parse_args(argv)
+
+    if args.path.endswith(".trace"):
+        return export(args.path, args.output, args.scale, args.every, args.workers)
+    import train
+    if args.path.endswith(".py"):          # exported by standalone.py
+        import standalone
+        net = standalone.load(args.path)
+    else:
+        import evaluate
+        net = evaluate.load_player(args.path, train.load_config(args.config))
+    train.DECISION_INTERVAL = args.decision_interval
+    fd, trace_path = tempfile.mkstemp(suffix=".trace")
+    os.close(fd)
+    try:
+        frames, score = play_run(net, args.seed, args.frames, trace_path)
+        print("Played {0} frames, score {1}".format(frames, score))
+        return export(trace_path, args.output, args.scale, args.every, args.workers)
+    finally:
+        os.remove(trace_path)
+
+
+if __name__ == '__main__':
+    main()